@@ -6,7 +6,25 @@ from datetime import datetime
 import pandas as pd
 import requests
 import json
+import numpy as np
 import base64
+import collections
+import math
+import os
+import threading
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from circuit_breaker import breaker_snapshots, create_circuit_breakers, describe_breaker
+from deploy_backends import deploy_org_headless, deploy_org_with_backend, new_org_result, summarize_user_results
+from deploy_cache import DeploymentCache, KnownUsersCache, KnownUsersView
+from distributions import apportioned_column, largest_remainder, probabilities, sample_column, sample_grouped_column
+from onboarding import (
+    abandon_user_flow, create_org_mappings, create_organization, onboard_user_flow, resolve_user_outcome,
+    step_user_flow
+)
+from snapshots import SnapshotEmployees, delete_snapshot, list_snapshots, load_snapshot, save_snapshot
+from tracing import NULL_TRACER, Tracer
+from wire_format import RequestEncoder
 
 # Initialize Faker
 fake = Faker()
@@ -63,6 +81,28 @@ qualifications = [
     "Licensed Practical Nurse (LPN)"
 ]
 
+notification_prefs = ["email", "sms", "both"]
+
+# Generated role types, in roster order
+role_types = ["staff", "instructor", "facility_admin"]
+
+@st.cache_resource
+def get_deployment_cache():
+    """Shared deployment cache for all sessions"""
+    return DeploymentCache()
+
+@st.cache_resource
+def get_known_users_cache():
+    """Shared known-users store for all sessions; wrap it in a KnownUsersView"""
+    return KnownUsersCache()
+
+def start_pipeline_trace(label):
+    """Create a tracer for the current run and keep it in session state"""
+    tracer = Tracer()
+    st.session_state.pipeline_trace = tracer
+    st.session_state.pipeline_trace_label = label
+    return tracer
+
 class UserGenerator:
     """Class to generate user data"""
     
@@ -73,16 +113,27 @@ class UserGenerator:
         """Reset unique constraints to allow regeneration"""
         self.fake.unique.clear()
     
-    def generate_user_data(self, role_type, org_name, org_types):
-        """Generate data for a single user"""
+    def generate_user_data(self, role_type, org_name, org_types, fields=None):
+        """Generate data for a single user
+        
+        fields, if given, holds pre-sampled org_type, prof_type,
+        notification_pref and qualification (see sample_user_fields);
+        otherwise they are drawn uniformly.
+        """
         first_name = self.fake.first_name()
         last_name = self.fake.last_name()
         phone_number = self.fake.numerify("5#########")
         email = f"{first_name.lower()}.{last_name.lower()}@{org_name.replace(' ', '').lower()}.org"
-        org_type = random.choice(org_types)
-        prof_type = random.choice(org_roles[org_type])
-        notification_pref = random.choice(["email", "sms", "both"])
-        qualification = random.choice(qualifications)
+        if fields is None:
+            org_type = random.choice(org_types)
+            prof_type = random.choice(org_roles[org_type])
+            notification_pref = random.choice(notification_prefs)
+            qualification = random.choice(qualifications)
+        else:
+            org_type = fields["org_type"]
+            prof_type = fields["prof_type"]
+            notification_pref = fields["notification_pref"]
+            qualification = fields["qualification"]
         start_date = self.fake.date_between(start_date='-5y', end_date='today').isoformat()
         role_admin_or_staff = "facility_admin" if role_type == "facility_admin" else "staff"
         role_instructor = "instructor" if role_type == "instructor" else None
@@ -103,10 +154,86 @@ class UserGenerator:
             "role_type": role_type  # For display purposes
         }
 
+def build_role_column(num_employees, staff_perc, instructor_perc, facility_admin_perc):
+    """Role type of every employee, apportioned exactly with the largest-remainder method
+    
+    Staff come first, then instructors, then facility admins.
+    """
+    return apportioned_column(
+        num_employees, role_types, [staff_perc, instructor_perc, facility_admin_perc]
+    ).tolist()
+
+def sample_user_fields(num_employees, org_types, field_weights=None, rng=None):
+    """Draw org_type, prof_type, notification_pref and qualification for a whole roster
+    
+    field_weights maps each of those field names to a {value: weight} dict;
+    values without a weight weigh 1. prof_type is drawn from the roles of
+    each row's org type. Returns one dict of field values per employee.
+    """
+    field_weights = field_weights or {}
+    rng = rng or np.random.default_rng()
+    org_type_column = sample_column(rng, org_types, num_employees, field_weights.get("org_type"))
+    columns = {
+        "org_type": org_type_column,
+        "prof_type": sample_grouped_column(rng, org_type_column, org_roles, field_weights.get("prof_type")),
+        "notification_pref": sample_column(
+            rng, notification_prefs, num_employees, field_weights.get("notification_pref")
+        ),
+        "qualification": sample_column(rng, qualifications, num_employees, field_weights.get("qualification"))
+    }
+    return [dict(zip(columns, values)) for values in zip(*(column.tolist() for column in columns.values()))]
+
+def field_weight_errors(org_types, field_weights=None):
+    """Messages for weights sample_user_fields cannot draw from; empty when they are usable"""
+    field_weights = field_weights or {}
+    org_type_weights = field_weights.get("org_type") or {}
+    checks = [
+        ("Org Type", org_types, org_type_weights),
+        ("Notification Preference", notification_prefs, field_weights.get("notification_pref")),
+        ("Qualification", qualifications, field_weights.get("qualification"))
+    ]
+    # Every org type that can be drawn needs a drawable professional type
+    checks += [
+        (f"Professional Type ({org_type})", org_roles[org_type], field_weights.get("prof_type"))
+        for org_type in org_types if float(org_type_weights.get(org_type, 1.0)) > 0
+    ]
+    errors = []
+    for label, values, weights in checks:
+        if not values:
+            continue
+        try:
+            probabilities(values, weights)
+        except ValueError:
+            errors.append(f"{label} weights need at least one value with a weight above 0")
+    return errors
+
+def build_employee_record(role_type, user_data):
+    """Create employee record for display from generated user data"""
+    return {
+        "Role Type": role_type,
+        "First Name": user_data["first_name"],
+        "Last Name": user_data["last_name"],
+        "Phone": user_data["phone_number"],
+        "Email": user_data["email"],
+        "Org Type": user_data["org_type"],
+        "Professional Type": user_data["prof_type"],
+        "Notification Preference": user_data["notification_pref"],
+        "Qualification": user_data["qualification"],
+        "Start Date": user_data["start_date"],
+        "Role Admin/Staff": user_data["role_admin_or_staff"],
+        "Role Instructor": user_data["role_instructor"],
+        "DB Status": "Generated",  # Database onboarding status
+        "Cognito Status": "Pending",  # Cognito onboarding status
+        "Temporary Password": None,  # Store temporary password
+        # Store API data separately
+        "api_data": user_data
+    }
+
 def generate_users_batch(num_employees, staff_perc, instructor_perc, 
-                        facility_admin_perc, org_name, org_types):
+                        facility_admin_perc, org_name, org_types, tracer=None, field_weights=None):
     """Generate fake users data"""
     
+    tracer = tracer or NULL_TRACER
     user_generator = UserGenerator()
     user_generator.reset_unique()  # Reset for fresh generation
     employees = []
@@ -116,49 +243,36 @@ def generate_users_batch(num_employees, staff_perc, instructor_perc,
     status_text = st.empty()
     
     try:
+        # Roles and weighted fields are drawn for the whole roster up front
+        with tracer.span("sample_fields", category="generate"):
+            role_column = build_role_column(num_employees, staff_perc, instructor_perc, facility_admin_perc)
+            user_fields = sample_user_fields(num_employees, org_types, field_weights)
+        
         for i in range(num_employees):
-            # Determine role type based on percentages
-            if i < num_employees * staff_perc:
-                role_type = "staff"
-            elif i < num_employees * (staff_perc + instructor_perc):
-                role_type = "instructor"
-            else:
-                role_type = "facility_admin"
+            role_type = role_column[i]
             
             # Generate user data
-            user_data = user_generator.generate_user_data(role_type, org_name, org_types)
-            
-            # Create employee record for display
-            employee = {
-                "Role Type": role_type,
-                "First Name": user_data["first_name"],
-                "Last Name": user_data["last_name"],
-                "Phone": user_data["phone_number"],
-                "Email": user_data["email"],
-                "Org Type": user_data["org_type"],
-                "Professional Type": user_data["prof_type"],
-                "Notification Preference": user_data["notification_pref"],
-                "Qualification": user_data["qualification"],
-                "Start Date": user_data["start_date"],
-                "Role Admin/Staff": user_data["role_admin_or_staff"],
-                "Role Instructor": user_data["role_instructor"],
-                "DB Status": "Generated",  # Database onboarding status
-                "Cognito Status": "Pending",  # Cognito onboarding status
-                "Temporary Password": None,  # Store temporary password
-                # Store API data separately
-                "api_data": user_data
-            }
+            with tracer.span("generate_user", category="generate", index=i):
+                user_data = user_generator.generate_user_data(role_type, org_name, org_types, user_fields[i])
+                
+                # Create employee record for display
+                employee = build_employee_record(role_type, user_data)
             
             employees.append(employee)
             
-            # Update status
-            status_text.text(f"✅ Generated: {user_data['first_name']} {user_data['last_name']} ({i+1}/{num_employees})")
-            
-            # Update progress
-            progress_bar.progress((i + 1) / num_employees)
+            with tracer.span("ui_flush", category="ui"):
+                # Update status
+                status_text.text(f"✅ Generated: {user_data['first_name']} {user_data['last_name']} ({i+1}/{num_employees})")
+                
+                # Update progress
+                progress_bar.progress((i + 1) / num_employees)
             
             # Small delay for visual effect
-            time.sleep(0.1)
+            with tracer.span("sleep", category="sleep"):
+                time.sleep(0.1)
+        
+        # Display final summary
+        st.success(f"Generation complete! {len(employees)} employees created.")
                 
     except Exception as e:
         st.error(f"Generation error: {str(e)}")
@@ -167,49 +281,56 @@ def generate_users_batch(num_employees, staff_perc, instructor_perc,
         progress_bar.empty()
         status_text.empty()
     
-    # Display final summary
-    st.success(f"Generation complete! {len(employees)} employees created.")
+    return employees
+
+def generate_org_employees(num_employees, staff_perc, instructor_perc, org_name, org_types, field_weights=None):
+    """Generate fake users data for one org without UI updates (used by batch mode)
     
+    Facility admins make up the remainder after staff and instructors.
+    """
+    user_generator = UserGenerator()
+    user_generator.reset_unique()
+    facility_admin_perc = max(0.0, 1.0 - staff_perc - instructor_perc)
+    role_column = build_role_column(num_employees, staff_perc, instructor_perc, facility_admin_perc)
+    user_fields = sample_user_fields(num_employees, org_types, field_weights)
+    employees = []
+    for role_type, fields in zip(role_column, user_fields):
+        user_data = user_generator.generate_user_data(role_type, org_name, org_types, fields)
+        employees.append(build_employee_record(role_type, user_data))
     return employees
 
-def call_api_endpoint(url, data, method="POST"):
-    """Helper function to call API endpoints"""
-    try:
-        headers = {"Content-Type": "application/json"}
-        
-        if method == "POST":
-            response = requests.post(url, json=data, headers=headers, timeout=30)
-        else:
-            response = requests.get(url, params=data, timeout=30)
-        
-        response.raise_for_status()
-        return {"success": True, "data": response.json()}
-    except requests.exceptions.RequestException as e:
-        return {"success": False, "error": str(e)}
-
-def create_credentials_file(user_data, temp_password):
-    """Create a credentials file for download"""
-    credentials = {
-        "user_info": {
-            "first_name": user_data["first_name"],
-            "last_name": user_data["last_name"],
-            "email": user_data["email"],
-            "organization": user_data["org_name"],
-            "role": user_data["role_type"]
-        },
-        "login_credentials": {
-            "email": user_data["email"],
-            "temporary_password": temp_password,
-            "instructions": "Please change this password on first login"
-        },
-        "generated_at": datetime.now().isoformat(),
-        "note": "This password will only be shown once. Please save it securely."
-    }
-    return json.dumps(credentials, indent=2)
+def show_notice(notice):
+    """Render a (level, text) notice with the matching Streamlit element"""
+    level, text = notice
+    getattr(st, level)(text)
+
+def show_breaker_summary(snapshots):
+    """Note endpoints whose circuit breaker opened during a deployment, from breaker snapshots"""
+    for snapshot in (snapshots or {}).values():
+        if snapshot["times_opened"]:
+            st.caption(
+                f"🛡️ Circuit breaker for {snapshot['name']} opened {snapshot['times_opened']} time(s); "
+                f"now {snapshot['state']}"
+            )
+
+def show_wire_summary(summary):
+    """Note request bytes on the wire compared with plain per-user JSON bodies"""
+    if summary["bytes_raw"]:
+        saved = 1 - summary["bytes_sent"] / summary["bytes_raw"]
+        st.caption(
+            f"📦 Request bodies: {summary['bytes_raw'] / 1024:,.1f} KB as plain JSON → "
+            f"{summary['bytes_sent'] / 1024:,.1f} KB on the wire ({saved:.0%} saved)"
+        )
 
-def deploy_to_database(employees, org_name, org_types, api_base_url):
-    """Deploy employees to database via API calls"""
+def deploy_to_database(employees, org_name, org_types, api_base_url, deployment_cache=None,
+                       known_users=None, tracer=None, breakers=None, max_queue_wait=600, encoder=None):
+    """Deploy employees to database via API calls
+    
+    With breakers, users whose next endpoint has an open circuit are queued
+    and resumed once it recovers (or failed after max_queue_wait seconds).
+    """
     
+    tracer = tracer or NULL_TRACER
     deployment_status = []
     total_steps = len(employees) * 2 + 2  # *2 for DB + Cognito per user, +2 for org creation and mapping
     
@@ -226,72 +347,33 @@ def deploy_to_database(employees, org_name, org_types, api_base_url):
         
         # Step 1: Create Organization
         main_status.text("🏢 Creating organization...")
-        org_data = {"org_name": org_name}
-        org_response = call_api_endpoint(f"{api_base_url}/org/", org_data)
-        
-        if org_response["success"]:
-            if org_response["data"]["status"] == 1:
-                st.success(f"✅ Organization '{org_name}' created successfully (ID: {org_response['data']['org_id']})")
-                deployment_status.append({
-                    "step": "Organization Creation",
-                    "status": "Success",
-                    "message": f"Organization ID: {org_response['data']['org_id']}"
-                })
-            else:
-                st.warning(f"⚠️ Organization '{org_name}' creation returned status 0 (may already exist)")
-                deployment_status.append({
-                    "step": "Organization Creation",
-                    "status": "Warning",
-                    "message": "Status 0 - Organization may already exist"
-                })
-        else:
-            st.error(f"❌ Failed to create organization: {org_response['error']}")
-            deployment_status.append({
-                "step": "Organization Creation",
-                "status": "Failed",
-                "message": org_response['error']
-            })
+        org_step, org_notice = create_organization(org_name, api_base_url, deployment_cache, tracer)
+        with tracer.span("ui_flush", category="ui"):
+            show_notice(org_notice)
+        deployment_status.append(org_step)
+        if org_step["status"] == "Failed":
             return deployment_status
         
         current_step += 1
         main_progress.progress(current_step / total_steps)
-        time.sleep(0.5)
+        if org_step["status"] != "Cached":
+            with tracer.span("sleep", category="sleep"):
+                time.sleep(0.5)
         
         # Step 2: Create Organization Mappings
         main_status.text("🔗 Creating organization mappings...")
-        mapping_data = {
-            "org_name": org_name,
-            "org_types": org_types
-        }
-        mapping_response = call_api_endpoint(f"{api_base_url}/create-org-mappings/", mapping_data)
-        
-        if mapping_response["success"]:
-            if len(mapping_response["data"]["orgmap_ids"]) >= 1:
-                st.success("✅ Organization types attached successfully")
-                deployment_status.append({
-                    "step": "Organization Mappings",
-                    "status": "Success",
-                    "message": "Organization types attached successfully"
-                })
-            else:
-                st.success("✅ Organization types already exist")
-                deployment_status.append({
-                    "step": "Organization Mappings",
-                    "status": "Success",
-                    "message": "Organization types already exist"
-                })
-        else:
-            st.error(f"❌ Failed to create organization mappings: {mapping_response['error']}")
-            deployment_status.append({
-                "step": "Organization Mappings",
-                "status": "Failed",
-                "message": mapping_response['error']
-            })
+        mapping_step, mapping_notice = create_org_mappings(org_name, org_types, api_base_url, deployment_cache, tracer)
+        with tracer.span("ui_flush", category="ui"):
+            show_notice(mapping_notice)
+        deployment_status.append(mapping_step)
+        if mapping_step["status"] == "Failed":
             return deployment_status
         
         current_step += 1
         main_progress.progress(current_step / total_steps)
-        time.sleep(0.5)
+        if mapping_step["status"] != "Cached":
+            with tracer.span("sleep", category="sleep"):
+                time.sleep(0.5)
         
         # Step 3: Onboard Users (Database + Cognito)
         main_status.text("👥 Onboarding users...")
@@ -305,100 +387,95 @@ def deploy_to_database(employees, org_name, org_types, api_base_url):
         st.session_state.new_user_credentials = []
         
         with user_progress_container:
-            user_results = []
+            results_by_index = {}
+            # Users whose next request hit an open breaker: (index, flow, pending request)
+            queued_users = collections.deque()
+            breaker_status = st.empty()
+            
+            def show_breaker_status():
+                if breakers:
+                    status_parts = [breaker.describe() for breaker in breakers.values()]
+                    if queued_users:
+                        status_parts.append(f"⏸️ {len(queued_users)} users queued")
+                    breaker_status.text(" | ".join(status_parts))
+            
+            def stage_text_updater(i, user_data):
+                def update_stage_text(stage):
+                    if stage == "db":
+                        main_status.text(f"📊 DB Onboarding: {user_data['first_name']} {user_data['last_name']} ({i+1}/{len(employees)})...")
+                    else:
+                        main_status.text(f"🔐 Cognito Onboarding: {user_data['first_name']} {user_data['last_name']} ({i+1}/{len(employees)})...")
+                return update_stage_text
+            
+            def finish_user(i, outcome):
+                nonlocal current_step
+                resolved = resolve_user_outcome(employees[i]["api_data"], outcome, tracer)
+                
+                with tracer.span("ui_flush", category="ui"):
+                    for notice in resolved["notices"]:
+                        show_notice(notice)
+                    st.session_state.employees[i].update(resolved["employee_updates"])
+                    
+                    # Store credentials in session state for persistence
+                    if resolved["credential"]:
+                        st.session_state.new_user_credentials.append(resolved["credential"])
+                    results_by_index[i] = resolved["result"]
+                    
+                    # Update progress (DB + Cognito, or skipped Cognito)
+                    current_step += 2
+                    main_progress.progress(current_step / total_steps)
+            
+            def queue_user(i, flow, request):
+                queued_users.append((i, flow, request))
+                status_field = "DB Status" if request[0] == "db" else "Cognito Status"
+                st.session_state.employees[i][status_field] = "Queued ⏸️"
             
             for i, employee in enumerate(employees):
                 user_data = employee["api_data"]
                 
-                # Step 3a: Database Onboarding
-                current_step += 1
-                main_status.text(f"📊 DB Onboarding: {user_data['first_name']} {user_data['last_name']} ({i+1}/{len(employees)})...")
+                # Step 3a/3b: Database Onboarding, then Cognito if DB succeeded
+                flow = onboard_user_flow(user_data, api_base_url, known_users, tracer)
+                with tracer.span("onboard_user", email=user_data["email"], index=i):
+                    state, value = step_user_flow(flow, None, breakers, stage_text_updater(i, user_data), encoder, tracer)
                 
-                # Call onboard user API
-                user_response = call_api_endpoint(f"{api_base_url}/onboard-user/", user_data)
+                if state == "blocked":
+                    queue_user(i, flow, value)
+                    show_breaker_status()
+                    continue
                 
-                if user_response["success"] and user_response["data"]["status"] == 1:
-                    st.success(f"✅ DB: {user_data['first_name']} {user_data['last_name']} onboarded successfully")
-                    st.session_state.employees[i]["DB Status"] = "Deployed ✅"
-                    
-                    # Step 3b: Cognito Onboarding (only if DB onboarding successful)
-                    current_step += 1
-                    main_status.text(f"🔐 Cognito Onboarding: {user_data['first_name']} {user_data['last_name']} ({i+1}/{len(employees)})...")
-                    
-                    # Call Cognito onboard API
-                    cognito_data = {"email": user_data["email"]}
-                    cognito_response = call_api_endpoint(f"{api_base_url}/cognito/onboard", cognito_data)
-                    
-                    if cognito_response["success"]:
-                        cognito_status = cognito_response["data"]["status"]
-                        cognito_message = cognito_response["data"]["message"]
-                        temp_password = cognito_response["data"].get("temporary_password")
-                        
-                        if cognito_status == "success":
-                            st.success(f"🔐 Cognito: {user_data['first_name']} {user_data['last_name']} - New user created")
-                            st.session_state.employees[i]["Cognito Status"] = "New User ✅"
-                            st.session_state.employees[i]["Temporary Password"] = temp_password
-                            
-                            # Store credentials in session state for persistence
-                            if temp_password:
-                                credentials_file = create_credentials_file(user_data, temp_password)
-                                credential_entry = {
-                                    "name": f"{user_data['first_name']} {user_data['last_name']}",
-                                    "email": user_data["email"],
-                                    "password": temp_password,
-                                    "credentials_file": credentials_file,
-                                    "created_at": datetime.now().isoformat()
-                                }
-                                st.session_state.new_user_credentials.append(credential_entry)
-                                
-                        elif cognito_status == "exists":
-                            st.info(f"ℹ️ Cognito: {user_data['first_name']} {user_data['last_name']} - User already exists")
-                            st.session_state.employees[i]["Cognito Status"] = "Exists ℹ️"
-                        else:
-                            st.warning(f"⚠️ Cognito: {user_data['first_name']} {user_data['last_name']} - {cognito_message}")
-                            st.session_state.employees[i]["Cognito Status"] = "Warning ⚠️"
-                            
-                        user_results.append({
-                            "name": f"{user_data['first_name']} {user_data['last_name']}",
-                            "db_status": "Success",
-                            "cognito_status": cognito_status,
-                            "message": f"DB: {user_response['data']['message']}, Cognito: {cognito_message}"
-                        })
-                    else:
-                        st.error(f"❌ Cognito API error for {user_data['first_name']} {user_data['last_name']}: {cognito_response['error']}")
-                        st.session_state.employees[i]["Cognito Status"] = "API Error ❌"
-                        user_results.append({
-                            "name": f"{user_data['first_name']} {user_data['last_name']}",
-                            "db_status": "Success",
-                            "cognito_status": "API Error",
-                            "message": f"DB: {user_response['data']['message']}, Cognito: {cognito_response['error']}"
-                        })
-                else:
-                    # DB onboarding failed, skip Cognito
-                    if user_response["success"]:
-                        error_msg = user_response["data"].get('message', 'Unknown error')
-                        st.error(f"❌ DB: Failed to onboard {user_data['first_name']} {user_data['last_name']}: {error_msg}")
-                    else:
-                        error_msg = user_response['error']
-                        st.error(f"❌ DB: API error for {user_data['first_name']} {user_data['last_name']}: {error_msg}")
-                    
-                    st.session_state.employees[i]["DB Status"] = "Failed ❌"
-                    st.session_state.employees[i]["Cognito Status"] = "Skipped"
-                    
-                    user_results.append({
-                        "name": f"{user_data['first_name']} {user_data['last_name']}",
-                        "db_status": "Failed",
-                        "cognito_status": "Skipped",
-                        "message": error_msg
-                    })
-                    
-                    # Skip Cognito step in progress
-                    current_step += 1
+                finish_user(i, value)
+                show_breaker_status()
+                if value["requests_skipped"] < 2:
+                    with tracer.span("sleep", category="sleep"):
+                        time.sleep(0.2)  # Small delay between requests
+            
+            # Resume queued users once their endpoint's breaker lets requests through
+            queue_deadline = time.monotonic() + max_queue_wait
+            while queued_users:
+                i, flow, request = queued_users.popleft()
+                breaker = breakers[request[0]]
+                user_data = employees[i]["api_data"]
                 
-                # Update progress
-                main_progress.progress(current_step / total_steps)
-                time.sleep(0.2)  # Small delay between requests
+                with tracer.span("breaker_wait", category="sleep", endpoint=breaker.name):
+                    while breaker.retry_in() > 0 and time.monotonic() < queue_deadline:
+                        main_status.text(f"⏸️ Waiting for {breaker.name} to recover ({len(queued_users) + 1} users queued)...")
+                        show_breaker_status()
+                        time.sleep(min(1.0, breaker.retry_in()))
+                
+                if breaker.retry_in() > 0:
+                    # Gave up waiting: fail the remaining steps without sending them
+                    finish_user(i, abandon_user_flow(flow, request, breakers))
+                    continue
+                
+                with tracer.span("onboard_user", email=user_data["email"], index=i, resumed=True):
+                    state, value = step_user_flow(flow, request, breakers, stage_text_updater(i, user_data), encoder, tracer)
+                if state == "blocked":
+                    queued_users.appendleft((i, flow, value))
+                else:
+                    finish_user(i, value)
+                show_breaker_status()
             
+            user_results = [results_by_index[i] for i in sorted(results_by_index)]
             deployment_status.extend(user_results)
         
         # Final status
@@ -406,10 +483,9 @@ def deploy_to_database(employees, org_name, org_types, api_base_url):
         main_status.text("🎉 Deployment completed!")
         
         # Summary
-        successful_db_users = sum(1 for result in user_results if result["db_status"] == "Success")
-        failed_db_users = len(user_results) - successful_db_users
-        new_cognito_users = sum(1 for result in user_results if result["cognito_status"] == "success")
-        existing_cognito_users = sum(1 for result in user_results if result["cognito_status"] == "exists")
+        summary = summarize_user_results(user_results)
+        successful_db_users = summary["successful_db_users"]
+        failed_db_users = summary["failed_db_users"]
         
         col1, col2, col3, col4 = st.columns(4)
         with col1:
@@ -417,9 +493,13 @@ def deploy_to_database(employees, org_name, org_types, api_base_url):
         with col2:
             st.metric("❌ DB Failed", failed_db_users)
         with col3:
-            st.metric("🆕 New Cognito Users", new_cognito_users)
+            st.metric("🆕 New Cognito Users", summary["new_cognito_users"])
         with col4:
-            st.metric("📋 Existing Cognito Users", existing_cognito_users)
+            st.metric("📋 Existing Cognito Users", summary["existing_cognito_users"])
+        if summary["requests_skipped"]:
+            st.caption(f"⏭️ {summary['requests_skipped']} onboarding requests skipped for users already known to exist")
+        show_wire_summary(summary)
+        show_breaker_summary(breaker_snapshots(breakers))
         
         # Final results
         if failed_db_users == 0:
@@ -432,6 +512,462 @@ def deploy_to_database(employees, org_name, org_types, api_base_url):
     
     return deployment_status
 
+def deploy_to_database_concurrent(employees, org_name, org_types, api_base_url, backend="threaded",
+                                  concurrency=16, deployment_cache=None, known_users=None, tracer=None,
+                                  breakers=None, max_queue_wait=600, encoder=None, threads_per_worker=8):
+    """Deploy employees with a concurrent backend and show a summary when done
+    
+    The deployment runs on a background thread while this thread shows the
+    live circuit breaker state (and, for worker processes, the queue
+    progress); the worker processes report their own breakers.
+    """
+    
+    st.subheader("🚀 Deployment Progress")
+    org_config = {"org_name": org_name, "org_types": org_types, "employees": employees}
+    worker_progress = st.progress(0) if backend == "processes" else None
+    breaker_status = st.empty() if breakers else None
+    # Filled in by the deployment thread; only this thread touches the UI
+    live = {"counts": None, "breakers": None}
+    
+    def update_worker_progress(counts):
+        live["counts"] = counts
+    
+    def update_breakers(snapshots):
+        live["breakers"] = snapshots
+    
+    def show_live_status():
+        if worker_progress and live["counts"]:
+            worker_progress.progress(live["counts"]["done"] / max(1, len(employees)))
+        if breaker_status:
+            snapshots = live["breakers"] if backend == "processes" else breaker_snapshots(breakers)
+            if snapshots:
+                breaker_status.text(" | ".join(describe_breaker(snapshot) for snapshot in snapshots.values()))
+    
+    with st.spinner(f"Deploying {len(employees)} employees ({backend} backend, concurrency {concurrency})..."):
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=1, thread_name_prefix="deploy") as executor:
+            future = executor.submit(
+                deploy_org_with_backend, org_config, api_base_url, backend, concurrency, deployment_cache,
+                known_users, tracer, on_progress=update_worker_progress if worker_progress else None,
+                breakers=breakers, max_queue_wait=max_queue_wait, encoder=encoder,
+                threads_per_worker=threads_per_worker, on_breakers=update_breakers
+            )
+            while not future.done():
+                show_live_status()
+                time.sleep(0.25)
+            org_result = future.result()
+        elapsed = time.perf_counter() - start
+        show_live_status()
+    
+    for step in org_result["deployment_status"][:2]:
+        if step["status"] == "Failed":
+            st.error(f"❌ {step['step']} failed: {step['message']}")
+            return org_result["deployment_status"]
+    
+    st.session_state.new_user_credentials = org_result["credentials"]
+    
+    summary = summarize_user_results(org_result["user_results"])
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("✅ DB Deployed", summary["successful_db_users"])
+    with col2:
+        st.metric("❌ DB Failed", summary["failed_db_users"])
+    with col3:
+        st.metric("🆕 New Cognito Users", summary["new_cognito_users"])
+    with col4:
+        st.metric("📋 Existing Cognito Users", summary["existing_cognito_users"])
+    st.caption(f"⏱️ {len(employees)} users in {elapsed:.2f}s ({len(employees) / elapsed if elapsed else 0:.1f} users/s)")
+    if summary["requests_skipped"]:
+        st.caption(f"⏭️ {summary['requests_skipped']} onboarding requests skipped for users already known to exist")
+    show_wire_summary(summary)
+    show_breaker_summary(org_result.get("breakers"))
+    
+    problems = [
+        result for result in org_result["user_results"]
+        if result["db_status"] != "Success" or result["cognito_status"] not in ("success", "exists")
+    ]
+    if problems:
+        st.write("**Users with errors:**")
+        st.dataframe(pd.DataFrame(problems), use_container_width=True)
+    
+    if summary["failed_db_users"] == 0:
+        st.success("🎉 All users deployed successfully to both database and Cognito!")
+    elif summary["successful_db_users"] > 0:
+        st.warning(f"⚠️ Partial deployment: {summary['successful_db_users']} successful, {summary['failed_db_users']} failed")
+    else:
+        st.error("❌ Deployment failed for all users")
+    
+    return org_result["deployment_status"]
+
+def benchmark_deploy_backends(api_base_url, num_users, concurrency, org_types, known_users=None):
+    """Deploy the same-sized roster with the threaded, async and multi-process backends and compare them
+    
+    Peak Python memory comes from tracemalloc; thread stacks are not Python
+    allocations, so the peak OS thread count is reported alongside it. Both
+    only cover this process, not the worker processes. The multi-process
+    backend splits concurrency across up to one process per core. With
+    known_users, each backend deploys its roster twice: a cold pass that
+    fills the cache and a warm pass where every user is already known.
+    """
+    rows = []
+    for backend in ("threaded", "async", "processes"):
+        org_name = f"Backend Benchmark {backend} {datetime.now().strftime('%Y%m%d%H%M%S')}"
+        users = generate_load_test_users(num_users, org_name, org_types)
+        org_config = {
+            "org_name": org_name,
+            "org_types": org_types,
+            "employees": [build_employee_record("staff", user_data) for user_data in users]
+        }
+        for cache_pass in (("cold", "warm") if known_users else ("off",)):
+            rows.append(benchmark_deploy_pass(
+                org_config, api_base_url, backend, concurrency, known_users, cache_pass
+            ))
+    return rows
+
+def benchmark_deploy_pass(org_config, api_base_url, backend, concurrency, known_users, cache_pass):
+    """Deploy org_config once and return a benchmark_deploy_backends row"""
+    num_users = len(org_config["employees"])
+    workers = concurrency
+    threads_per_worker = 1
+    if backend == "processes":
+        workers = min(concurrency, os.cpu_count() or 4)
+        threads_per_worker = math.ceil(concurrency / workers)
+    peak_threads = [threading.active_count()]
+    stop_sampling = threading.Event()
+    
+    def sample_threads():
+        while not stop_sampling.wait(0.02):
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+    
+    sampler = threading.Thread(target=sample_threads, name="thread-sampler", daemon=True)
+    sampler.start()
+    tracemalloc.start()
+    try:
+        start = time.perf_counter()
+        org_result = deploy_org_with_backend(
+            org_config, api_base_url, backend, workers, known_users=known_users,
+            threads_per_worker=threads_per_worker
+        )
+        elapsed = time.perf_counter() - start
+        _, peak_memory = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        stop_sampling.set()
+        sampler.join()
+    
+    summary = summarize_user_results(org_result["user_results"])
+    return {
+        "Backend": backend,
+        "Known Users Cache": cache_pass,
+        "Users": num_users,
+        "Concurrency": workers * threads_per_worker,
+        "Elapsed (s)": elapsed,
+        "Throughput (users/s)": num_users / elapsed if elapsed else 0.0,
+        "Peak Python Memory (MB)": peak_memory / (1024 * 1024),
+        "Peak OS Threads": peak_threads[0] - 1,  # excluding the sampler
+        "DB Deployed": summary["successful_db_users"],
+        "DB Failed": summary["failed_db_users"],
+        "Requests Skipped": summary["requests_skipped"]
+    }
+
+def deploy_multiple_orgs(org_configs, api_base_url, max_workers=4, deployment_cache=None,
+                         known_users=None, tracer=None, breakers=None, max_queue_wait=600, encoder=None):
+    """Deploy several organizations concurrently, one worker thread per org"""
+    
+    st.subheader("🏢 Multi-Organization Deployment Progress")
+    batch_progress = st.progress(0)
+    batch_status = st.empty()
+    org_results = []
+    
+    # Workers only do network calls; all UI updates happen on this thread
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="org-deploy") as executor:
+        futures = {
+            executor.submit(
+                deploy_org_headless, org_config, api_base_url, deployment_cache, known_users, tracer,
+                breakers=breakers, max_queue_wait=max_queue_wait, encoder=encoder
+            ): org_config["org_name"]
+            for org_config in org_configs
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            org_name = futures[future]
+            try:
+                org_result = future.result()
+            except Exception as e:
+                org_result = new_org_result(org_name)
+                org_result["deployment_status"].append(
+                    {"step": "Organization Deployment", "status": "Failed", "message": str(e)}
+                )
+            org_results.append(org_result)
+            batch_status.text(f"✅ Finished: {org_name} ({done}/{len(org_configs)})")
+            batch_progress.progress(done / len(org_configs))
+    
+    batch_status.text("🎉 Multi-organization deployment completed!")
+    
+    # Per-org summary table
+    summary_rows = []
+    for org_result in sorted(org_results, key=lambda r: r["org_name"]):
+        failed_step = next((s for s in org_result["deployment_status"][:2] if s["status"] == "Failed"), None)
+        summary = summarize_user_results(org_result["user_results"])
+        summary_rows.append({
+            "Organization": org_result["org_name"],
+            "Org Status": f"Failed: {failed_step['message']}" if failed_step else "OK",
+            "Org Calls Skipped (cached)": org_result["org_calls_skipped"],
+            "DB Deployed": summary["successful_db_users"],
+            "DB Failed": summary["failed_db_users"],
+            "New Cognito Users": summary["new_cognito_users"],
+            "Existing Cognito Users": summary["existing_cognito_users"],
+            "User Requests Skipped (cached)": summary["requests_skipped"],
+            "Request KB Sent": summary["bytes_sent"] / 1024
+        })
+    st.dataframe(pd.DataFrame(summary_rows), use_container_width=True)
+    show_wire_summary(summarize_user_results(
+        [result for org_result in org_results for result in org_result["user_results"]]
+    ))
+    show_breaker_summary(breaker_snapshots(breakers))
+    
+    return org_results
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def classify_request_error(error):
+    """Short label for a failed request, used in error breakdowns"""
+    if isinstance(error, requests.exceptions.Timeout):
+        return "Timeout"
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return "Connection error"
+    if isinstance(error, requests.exceptions.HTTPError) and error.response is not None:
+        return f"HTTP {error.response.status_code}"
+    return type(error).__name__
+
+def generate_load_test_users(count, org_name, org_types):
+    """Generate users with unique emails so every arrival is a distinct user"""
+    user_generator = UserGenerator()
+    run_id = datetime.now().strftime('%Y%m%d%H%M%S')
+    users = []
+    for k in range(count):
+        user_data = user_generator.generate_user_data("staff", org_name, org_types)
+        local_part, domain = user_data["email"].split("@", 1)
+        user_data["email"] = f"{local_part}+lt{run_id}{k}@{domain}"
+        users.append(user_data)
+    return users
+
+def run_load_test(api_base_url, users, target_rate, duration_seconds, max_workers=200,
+                  timeout=30, on_progress=None):
+    """Replay onboarding requests at a fixed arrival rate (open loop)
+    
+    Each arrival sends /onboard-user/ and /cognito/onboard for one user.
+    Arrivals are dispatched on schedule regardless of outstanding responses.
+    Latency is measured from the intended send time, so requests stuck behind
+    a slow server or a saturated worker pool still count against it
+    (coordinated-omission correction); service time from the actual send is
+    reported alongside.
+    """
+    num_arrivals = max(1, int(target_rate * duration_seconds))
+    interval = 1.0 / target_rate
+    samples = []  # (endpoint, corrected latency, service time, error kind)
+    samples_lock = threading.Lock()
+    thread_local = threading.local()
+    headers = {"Content-Type": "application/json"}
+    
+    def send(endpoint, payload, intended_start):
+        session = getattr(thread_local, "session", None)
+        if session is None:
+            session = thread_local.session = requests.Session()
+        actual_start = time.perf_counter()
+        error_kind = None
+        try:
+            response = session.post(f"{api_base_url}{endpoint}", json=payload, headers=headers, timeout=timeout)
+            response.raise_for_status()
+            response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            error_kind = classify_request_error(e)
+        end = time.perf_counter()
+        with samples_lock:
+            samples.append((endpoint, end - intended_start, end - actual_start, error_kind))
+    
+    progress_every = max(1, int(target_rate) // 4)
+    max_dispatch_lag = 0.0
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="load-test")
+    start = time.perf_counter()
+    try:
+        for k in range(num_arrivals):
+            intended_start = start + k * interval
+            delay = intended_start - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                max_dispatch_lag = max(max_dispatch_lag, -delay)
+            
+            user_data = users[k % len(users)]
+            executor.submit(send, "/onboard-user/", user_data, intended_start)
+            executor.submit(send, "/cognito/onboard", {"email": user_data["email"]}, intended_start)
+            
+            if on_progress and (k + 1) % progress_every == 0:
+                on_progress(k + 1, num_arrivals)
+        dispatch_elapsed = time.perf_counter() - start
+    finally:
+        executor.shutdown(wait=True)
+    elapsed = time.perf_counter() - start
+    
+    return summarize_load_test(samples, target_rate * 2, dispatch_elapsed, elapsed, max_dispatch_lag)
+
+def summarize_load_test(samples, target_request_rate, dispatch_elapsed, elapsed, max_dispatch_lag):
+    """Build throughput, latency percentile and error tables from load test samples"""
+    endpoint_rows = []
+    for endpoint in sorted({sample[0] for sample in samples}) + ["All"]:
+        endpoint_samples = [sample for sample in samples if endpoint == "All" or sample[0] == endpoint]
+        corrected = sorted(sample[1] * 1000 for sample in endpoint_samples)
+        service = sorted(sample[2] * 1000 for sample in endpoint_samples)
+        errors = sum(1 for sample in endpoint_samples if sample[3])
+        endpoint_rows.append({
+            "Endpoint": endpoint,
+            "Requests": len(endpoint_samples),
+            "Errors": errors,
+            "Throughput (req/s)": (len(endpoint_samples) - errors) / elapsed if elapsed else 0.0,
+            "p50 (ms)": percentile(corrected, 50),
+            "p90 (ms)": percentile(corrected, 90),
+            "p99 (ms)": percentile(corrected, 99),
+            "p99.9 (ms)": percentile(corrected, 99.9),
+            "Max (ms)": corrected[-1] if corrected else 0.0,
+            "Service p50 (ms)": percentile(service, 50),
+            "Service p99 (ms)": percentile(service, 99)
+        })
+    
+    error_counts = {}
+    for endpoint, _, _, error_kind in samples:
+        if error_kind:
+            error_counts[(endpoint, error_kind)] = error_counts.get((endpoint, error_kind), 0) + 1
+    error_rows = [
+        {"Endpoint": endpoint, "Error": error_kind, "Count": count}
+        for (endpoint, error_kind), count in sorted(error_counts.items(), key=lambda item: -item[1])
+    ]
+    
+    succeeded = sum(1 for sample in samples if not sample[3])
+    return {
+        "target_rate": target_request_rate,
+        "achieved_send_rate": len(samples) / dispatch_elapsed if dispatch_elapsed else 0.0,
+        "throughput": succeeded / elapsed if elapsed else 0.0,
+        "requests_sent": len(samples),
+        "requests_succeeded": succeeded,
+        "elapsed": elapsed,
+        "max_dispatch_lag_ms": max_dispatch_lag * 1000,
+        "endpoints": endpoint_rows,
+        "errors": error_rows
+    }
+
+def show_load_test_results(results):
+    """Display load test throughput, latency percentiles and error breakdown"""
+    st.subheader("📈 Load Test Results")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Target Rate (req/s)", f"{results['target_rate']:.1f}")
+    with col2:
+        st.metric("Achieved Send Rate (req/s)", f"{results['achieved_send_rate']:.1f}")
+    with col3:
+        st.metric("Throughput (ok req/s)", f"{results['throughput']:.1f}")
+    with col4:
+        st.metric("Errors", results["requests_sent"] - results["requests_succeeded"])
+    st.caption(
+        f"{results['requests_sent']} requests in {results['elapsed']:.1f}s. "
+        f"Latencies are measured from the scheduled send time (coordinated-omission corrected); "
+        f"max dispatcher lag {results['max_dispatch_lag_ms']:.1f} ms."
+    )
+    st.dataframe(pd.DataFrame(results["endpoints"]).round(2), use_container_width=True)
+    if results["errors"]:
+        st.write("**Error Breakdown:**")
+        st.dataframe(pd.DataFrame(results["errors"]), use_container_width=True)
+
+def count_employee_values(employees, field, default=None):
+    """Count employees per value of a record field
+    
+    Snapshot-backed employees are counted on their Arrow columns instead of
+    materializing every row.
+    """
+    if isinstance(employees, SnapshotEmployees):
+        return employees.value_counts(field, default)
+    counts = {}
+    for emp in employees:
+        value = emp.get(field, default)
+        counts[value] = counts.get(value, 0) + 1
+    return counts
+
+def filter_employees(employees, field, value, default=None):
+    """Employees whose record field equals value"""
+    if isinstance(employees, SnapshotEmployees):
+        return employees.where(field, value, default)
+    return [emp for emp in employees if emp.get(field, default) == value]
+
+def edit_field_weights(label, values, key):
+    """Editable value/weight table; returns a {value: weight} dict"""
+    edited = st.data_editor(
+        pd.DataFrame({"Value": values, "Weight": [1.0] * len(values)}),
+        key=f"{key}_{'|'.join(values)}",  # Start over when the value list changes
+        hide_index=True,
+        disabled=["Value"],
+        use_container_width=True,
+        column_config={
+            "Value": st.column_config.TextColumn(label),
+            "Weight": st.column_config.NumberColumn("Weight", min_value=0.0, step=0.1)
+        }
+    )
+    # A cleared cell falls back to the default weight of 1, like a value missing from the weights
+    return dict(zip(edited["Value"], edited["Weight"].fillna(1.0)))
+
+def show_snapshot_controls():
+    """Sidebar controls to save the current dataset and load saved snapshots"""
+    if st.session_state.get('employees'):
+        snapshot_name = st.text_input(
+            "Snapshot name",
+            value=f"{st.session_state.get('last_org_name', 'dataset')} {datetime.now().strftime('%Y%m%d')}"
+        )
+        if st.button("💾 Save Snapshot"):
+            try:
+                start = time.perf_counter()
+                path = save_snapshot(
+                    st.session_state.employees, snapshot_name, st.session_state.get('last_org_name'),
+                    st.session_state.get('last_org_types')
+                )
+                st.success(f"Saved {len(st.session_state.employees):,} employees to {path} in {time.perf_counter() - start:.2f}s")
+            except (OSError, ValueError) as e:
+                st.error(f"Snapshot save error: {str(e)}")
+    
+    snapshot_infos = list_snapshots()
+    if not snapshot_infos:
+        st.caption("No saved snapshots yet")
+        return
+    snapshot_labels = {
+        f"{info['name']} ({info['rows']:,} users, {info['size_mb']:.1f} MB)": info for info in snapshot_infos
+    }
+    selected_snapshot = snapshot_labels[st.selectbox("Saved snapshots", list(snapshot_labels.keys()))]
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📂 Load"):
+            try:
+                start = time.perf_counter()
+                employees, info = load_snapshot(selected_snapshot["path"])
+                org_types = info["org_types"] or list(count_employee_values(employees, 'Org Type'))
+                st.session_state.employees = employees
+                st.session_state.last_org_name = info["org_name"] or info["name"]
+                st.session_state.last_org_types = [org_type for org_type in org_types if org_type in org_roles]
+                # Deploy uses the configuration widgets, which are drawn after the sidebar
+                st.session_state.org_desired_name = st.session_state.last_org_name
+                if st.session_state.last_org_types:
+                    st.session_state.desired_org_types = st.session_state.last_org_types
+                if 'deployment_status' in st.session_state:
+                    del st.session_state.deployment_status
+                st.success(f"Loaded {info['rows']:,} employees in {(time.perf_counter() - start) * 1000:.0f} ms")
+            except (OSError, ValueError) as e:
+                st.error(f"Snapshot load error: {str(e)}")
+    with col2:
+        if st.button("🗑️ Delete"):
+            delete_snapshot(selected_snapshot["path"])
+            st.rerun()
+
 
 def show_persistent_credentials():
     """Display persistent credentials section"""
@@ -515,6 +1051,26 @@ def show_persistent_credentials():
             )
 
 
+def show_pipeline_trace():
+    """Display the last recorded pipeline trace with a Chrome trace download"""
+    tracer = st.session_state.get('pipeline_trace')
+    if not tracer or not tracer.events:
+        return
+    
+    st.markdown("---")
+    st.subheader("⏱️ Pipeline Trace")
+    st.caption(f"{st.session_state.get('pipeline_trace_label', 'Last run')} - {len(tracer.events)} spans recorded")
+    st.dataframe(pd.DataFrame(tracer.summary()).round(2), use_container_width=True)
+    st.download_button(
+        label="📥 Download Chrome Trace",
+        data=tracer.to_chrome_trace(),
+        file_name=f"pipeline_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json",
+        help="Open in chrome://tracing or ui.perfetto.dev",
+        key="download_pipeline_trace"
+    )
+
+
 def display_employee_card(employee, index):
     """Display employee information in a card format"""
     
@@ -633,25 +1189,107 @@ def main():
         st.write("- Multiple organization types")
         st.write("- Deploy to database via API")
         st.write("- Cognito user creation")
+        st.write("- Multi-organization batch deployment")
+        st.write("- Open-loop onboarding load tests")
+        st.write("- Compressed and bulk request encoding")
+        st.write("- Saved dataset snapshots")
         
         st.markdown("---")
         st.subheader("🔧 API Configuration")
         st.info(f"API URL: {API_BASE_URL}")
         
+        st.markdown("---")
+        st.subheader("⏱️ Tracing")
+        record_trace = st.checkbox(
+            "Record pipeline trace",
+            value=False,
+            help="Time each generation/deployment stage and export it as a Chrome trace"
+        )
+        
+        st.markdown("---")
+        st.subheader("🛡️ Circuit Breaker")
+        use_circuit_breaker = st.checkbox(
+            "Fail fast on degraded endpoints",
+            value=True,
+            help="Queue users instead of calling an endpoint that keeps failing or timing out"
+        )
+        breaker_failure_rate = st.slider("Failure rate to open", min_value=0.1, max_value=1.0, value=0.5, step=0.1)
+        breaker_slow_call = st.number_input("Slow call threshold (s)", min_value=1, max_value=30, value=10)
+        breaker_cooldown = st.number_input("Cooldown before probe (s)", min_value=1, max_value=600, value=30)
+        breaker_max_queue_wait = st.number_input("Max queue wait (min)", min_value=1, max_value=240, value=10)
+        circuit_breakers = None
+        if use_circuit_breaker:
+            circuit_breakers = create_circuit_breakers(
+                failure_rate_threshold=breaker_failure_rate,
+                slow_call_seconds=breaker_slow_call,
+                cooldown_seconds=breaker_cooldown
+            )
+        
+        st.markdown("---")
+        st.subheader("📦 Request Encoding")
+        compression_options = {"Off (plain JSON)": None, "gzip": "gzip", "zstd": "zstd"}
+        request_compression = compression_options[st.selectbox(
+            "Request compression",
+            list(compression_options.keys()),
+            index=1,
+            help="Compact JSON bodies, compressed once the server advertises support for the coding"
+        )]
+        request_encoder = RequestEncoder(request_compression) if request_compression else None
+        
+        st.markdown("---")
+        st.subheader("🗄️ Deployment Cache")
+        use_deployment_cache = st.checkbox(
+            "Skip cached org/mapping calls",
+            value=True,
+            help="Reuse org IDs and org type mappings created by previous deployments"
+        )
+        deployment_cache = get_deployment_cache()
+        cache_stats = deployment_cache.stats()
+        st.text(f"Cached orgs: {cache_stats['orgs']}")
+        st.text(f"Cached org mappings: {cache_stats['org_mappings']}")
+        if st.button("🗑️ Clear Deployment Cache"):
+            deployment_cache.clear()
+            st.success("Deployment cache cleared!")
+            st.rerun()
+        if not use_deployment_cache:
+            deployment_cache = None
+        
+        st.markdown("---")
+        st.subheader("👤 Known Users Cache")
+        use_known_users = st.checkbox(
+            "Skip users known to exist",
+            value=True,
+            help="Skip DB/Cognito onboarding for users previous deployments reported as deployed or existing"
+        )
+        known_users_ttl_hours = st.number_input("Known user TTL (hours)", min_value=1, max_value=24 * 30, value=24)
+        known_users = KnownUsersView(
+            get_known_users_cache(), ttl_seconds=known_users_ttl_hours * 3600, bypass=not use_known_users
+        )
+        known_users_stats = known_users.stats()
+        st.text(f"Known users: {known_users_stats['users']}")
+        st.text(f"In DB: {known_users_stats['in_db']} | In Cognito: {known_users_stats['in_cognito']}")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("🧹 Purge Expired"):
+                known_users.purge_expired()
+                st.rerun()
+        with col2:
+            if st.button("🗑️ Clear Users"):
+                known_users.clear()
+                st.success("Known users cache cleared!")
+                st.rerun()
+        
+        st.markdown("---")
+        st.subheader("💾 Dataset Snapshots")
+        show_snapshot_controls()
+        
         st.markdown("---")
         st.subheader("📊 Quick Stats")
         if 'employees' in st.session_state:
             st.metric("Total Generated", len(st.session_state.employees))
-            role_counts = {}
-            db_status_counts = {}
-            cognito_status_counts = {}
-            for emp in st.session_state.employees:
-                role = emp['Role Type']
-                db_status = emp.get('DB Status', 'Generated')
-                cognito_status = emp.get('Cognito Status', 'Pending')
-                role_counts[role] = role_counts.get(role, 0) + 1
-                db_status_counts[db_status] = db_status_counts.get(db_status, 0) + 1
-                cognito_status_counts[cognito_status] = cognito_status_counts.get(cognito_status, 0) + 1
+            role_counts = count_employee_values(st.session_state.employees, 'Role Type')
+            db_status_counts = count_employee_values(st.session_state.employees, 'DB Status', 'Generated')
+            cognito_status_counts = count_employee_values(st.session_state.employees, 'Cognito Status', 'Pending')
             
             st.write("**By Role:**")
             for role, count in role_counts.items():
@@ -677,8 +1315,14 @@ def main():
     
     col1, col2 = st.columns(2)
     
+    # Keyed so loading a snapshot can restore the settings it was generated with
+    if 'org_desired_name' not in st.session_state:
+        st.session_state.org_desired_name = "Sunrise Senior Living"
+    if 'desired_org_types' not in st.session_state:
+        st.session_state.desired_org_types = ["ALF/SHE", "ALF/SHE memory care"]
+    
     with col1:
-        org_desired_name = st.text_input("Organization Name", value="Sunrise Senior Living")
+        org_desired_name = st.text_input("Organization Name", key="org_desired_name")
         num_employees = st.number_input("Number of Employees", min_value=1, max_value=100, value=10)
         
         st.write("**Role Distribution:**")
@@ -692,7 +1336,7 @@ def main():
         desired_org_types = st.multiselect(
             "Select Organization Types",
             org_types,
-            default=["ALF/SHE", "ALF/SHE memory care"]
+            key="desired_org_types"
         )
         
         # Validation
@@ -701,9 +1345,78 @@ def main():
             st.error(f"⚠️ Percentages must add up to 1.0. Current total: {total_percentage:.1f}")
         else:
             st.success("✅ Percentages add up to 1.0")
+            role_split = largest_remainder(num_employees, [staff_perc, instructor_perc, facility_admin_perc])
+            st.caption(
+                f"{num_employees} employees: {role_split[0]} staff, {role_split[1]} instructors, "
+                f"{role_split[2]} facility admins"
+            )
             
         if not desired_org_types:
             st.error("⚠️ Please select at least one organization type")
+        
+        st.write("**Deployment Backend:**")
+        deployment_backends = {
+            "Sequential (live progress)": "sequential",
+            "Threaded": "threaded",
+            "Async (aiohttp)": "async",
+            "Multi-process": "processes",
+            "Bulk (batched requests)": "bulk"
+        }
+        deployment_backend = deployment_backends[st.radio(
+            "Deployment Backend",
+            list(deployment_backends.keys()),
+            horizontal=True,
+            label_visibility="collapsed",
+            help="Threaded and async backends onboard users concurrently and show a summary when done"
+        )]
+        deployment_threads_per_worker = 8
+        if deployment_backend == "processes":
+            col1, col2 = st.columns(2)
+            with col1:
+                deployment_concurrency = st.number_input(
+                    "Worker Processes", min_value=1, max_value=64, value=os.cpu_count() or 4,
+                    help="Users are sharded by email hash across this many processes"
+                )
+            with col2:
+                deployment_threads_per_worker = st.number_input(
+                    "Threads per Process", min_value=1, max_value=64, value=8,
+                    help="Users each process onboards at once; each result is saved as soon as its user finishes"
+                )
+        elif deployment_backend == "bulk":
+            deployment_concurrency = st.number_input(
+                "Users per Batch", min_value=1, max_value=1000, value=100,
+                help="Users sent per request to the bulk onboarding endpoints"
+            )
+        else:
+            deployment_concurrency = st.slider(
+                "Concurrent Users", min_value=1, max_value=500, value=32,
+                disabled=deployment_backend == "sequential"
+            )
+    
+    with st.expander("⚖️ Field Distributions"):
+        st.write("Relative weights for sampled fields. Equal weights draw uniformly; 0 excludes a value.")
+        col1, col2 = st.columns(2)
+        with col1:
+            org_type_weights = edit_field_weights("Org Type", desired_org_types, "org_type_weights")
+            prof_type_weights = edit_field_weights(
+                "Professional Type",
+                list(dict.fromkeys(role for org_type in desired_org_types for role in org_roles[org_type])),
+                "prof_type_weights"
+            )
+        with col2:
+            qualification_weights = edit_field_weights("Qualification", qualifications, "qualification_weights")
+            notification_pref_weights = edit_field_weights(
+                "Notification Preference", notification_prefs, "notification_pref_weights"
+            )
+    field_weights = {
+        "org_type": org_type_weights,
+        "prof_type": prof_type_weights,
+        "qualification": qualification_weights,
+        "notification_pref": notification_pref_weights
+    }
+    weight_errors = field_weight_errors(desired_org_types, field_weights)
+    for weight_error in weight_errors:
+        st.error(f"⚠️ {weight_error}")
     
     st.markdown('</div>', unsafe_allow_html=True)
     
@@ -739,20 +1452,35 @@ def main():
             del st.session_state.new_user_credentials
         if 'last_org_name' in st.session_state:
             del st.session_state.last_org_name
+        if 'last_org_types' in st.session_state:
+            del st.session_state.last_org_types
+        if 'batch_deployment_status' in st.session_state:
+            del st.session_state.batch_deployment_status
+        if 'pipeline_trace' in st.session_state:
+            del st.session_state.pipeline_trace
+        if 'load_test_results' in st.session_state:
+            del st.session_state.load_test_results
+        if 'backend_benchmark' in st.session_state:
+            del st.session_state.backend_benchmark
         st.success("All results and credentials cleared!")
         st.rerun()
     
     # Generate or refresh data
     if generate_button or refresh_button:
-        if desired_org_types and abs(total_percentage - 1.0) <= 0.001:
+        if desired_org_types and abs(total_percentage - 1.0) <= 0.001 and not weight_errors:
             try:
+                tracer = start_pipeline_trace("Generation") if record_trace else None
                 with st.spinner("Generating fake employee data..."):
                     employees = generate_users_batch(
                         num_employees, staff_perc, instructor_perc, 
-                        facility_admin_perc, org_desired_name, desired_org_types
+                        facility_admin_perc, org_desired_name, desired_org_types,
+                        tracer, field_weights
                     )
+                # Keep the current roster (and the error on screen) if nothing was generated
+                if employees:
                     st.session_state.employees = employees
                     st.session_state.last_org_name = org_desired_name  # Store org name for credentials
+                    st.session_state.last_org_types = desired_org_types
                     # Clear previous deployment status
                     if 'deployment_status' in st.session_state:
                         del st.session_state.deployment_status
@@ -769,12 +1497,36 @@ def main():
     if deploy_button and 'employees' in st.session_state and len(st.session_state.employees) > 0:
         try:
             st.markdown('<div class="deploy-section">', unsafe_allow_html=True)
-            deployment_status = deploy_to_database(
-                st.session_state.employees, 
-                org_desired_name, 
-                desired_org_types,
-                API_BASE_URL
-            )
+            tracer = start_pipeline_trace("Deployment") if record_trace else None
+            if deployment_backend == "sequential":
+                deployment_status = deploy_to_database(
+                    st.session_state.employees, 
+                    org_desired_name, 
+                    desired_org_types,
+                    API_BASE_URL,
+                    deployment_cache,
+                    known_users,
+                    tracer,
+                    circuit_breakers,
+                    breaker_max_queue_wait * 60,
+                    request_encoder
+                )
+            else:
+                deployment_status = deploy_to_database_concurrent(
+                    st.session_state.employees,
+                    org_desired_name,
+                    desired_org_types,
+                    API_BASE_URL,
+                    deployment_backend,
+                    deployment_concurrency,
+                    deployment_cache,
+                    known_users,
+                    tracer,
+                    circuit_breakers,
+                    breaker_max_queue_wait * 60,
+                    request_encoder,
+                    deployment_threads_per_worker
+                )
             st.session_state.deployment_status = deployment_status
             st.markdown('</div>', unsafe_allow_html=True)
             
@@ -783,9 +1535,132 @@ def main():
         except Exception as e:
             st.error(f"Deployment error: {str(e)}")
     
+    # Multi-organization batch deployment
+    with st.expander("🏢 Multi-Organization Batch Deployment"):
+        st.write("Generate and deploy several organizations at once using the role distribution and organization types above.")
+        batch_org_names_text = st.text_area("Organization Names (one per line)", value="")
+        col1, col2 = st.columns(2)
+        with col1:
+            batch_num_employees = st.number_input("Employees per Organization", min_value=1, max_value=100, value=10)
+        with col2:
+            batch_max_workers = st.slider("Concurrent Organizations", min_value=1, max_value=16, value=4)
+        batch_deploy_button = st.button("🚀 Generate & Deploy All Organizations")
+    
+    if batch_deploy_button:
+        batch_org_names = list(dict.fromkeys(name.strip() for name in batch_org_names_text.splitlines() if name.strip()))
+        if not batch_org_names:
+            st.error("Please enter at least one organization name.")
+        elif not desired_org_types or abs(total_percentage - 1.0) > 0.001 or weight_errors:
+            st.error("Please fix the configuration errors before generating data.")
+        else:
+            try:
+                org_configs = []
+                tracer = start_pipeline_trace("Multi-organization deployment") if record_trace else None
+                with st.spinner("Generating fake employee data for all organizations..."):
+                    for batch_org_name in batch_org_names:
+                        org_configs.append({
+                            "org_name": batch_org_name,
+                            "org_types": desired_org_types,
+                            "employees": generate_org_employees(
+                                batch_num_employees, staff_perc, instructor_perc,
+                                batch_org_name, desired_org_types, field_weights
+                            )
+                        })
+                
+                org_results = deploy_multiple_orgs(
+                    org_configs, API_BASE_URL, batch_max_workers, deployment_cache, known_users, tracer,
+                    circuit_breakers, breaker_max_queue_wait * 60, request_encoder
+                )
+                
+                # Keep new credentials from all orgs available for download
+                st.session_state.new_user_credentials = [
+                    cred for org_result in org_results for cred in org_result["credentials"]
+                ]
+                st.session_state.last_org_name = ", ".join(batch_org_names)
+                st.session_state.batch_deployment_status = {
+                    org_result["org_name"]: org_result["deployment_status"] for org_result in org_results
+                }
+            except Exception as e:
+                st.error(f"Batch deployment error: {str(e)}")
+    
+    # Open-loop load test
+    with st.expander("📈 Onboarding Load Test"):
+        st.write("Fire `/onboard-user/` and `/cognito/onboard` at a fixed arrival rate without waiting for responses.")
+        st.warning("⚠️ Every arrival creates a new user. Point this at a test environment or the local stub (`python stub_server.py`).")
+        load_test_url = st.text_input("Target API URL", value=API_BASE_URL)
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            load_test_rate = st.number_input("Arrival Rate (users/s)", min_value=0.1, max_value=1000.0, value=5.0)
+        with col2:
+            load_test_duration = st.number_input("Duration (s)", min_value=1, max_value=600, value=10)
+        with col3:
+            load_test_workers = st.number_input("Max In-Flight Requests", min_value=1, max_value=2000, value=200)
+        with col4:
+            load_test_timeout = st.number_input("Request Timeout (s)", min_value=1, max_value=120, value=30)
+        col1, col2 = st.columns(2)
+        with col1:
+            load_test_button = st.button("📈 Run Load Test")
+        with col2:
+            benchmark_button = st.button(
+                "⚖️ Compare Deployment Backends",
+                help="Deploys rate x duration users with each backend at the Max In-Flight Requests concurrency"
+            )
+    
+    if load_test_button:
+        if not desired_org_types:
+            st.error("Please select at least one organization type.")
+        else:
+            try:
+                num_arrivals = max(1, int(load_test_rate * load_test_duration))
+                with st.spinner(f"Generating {num_arrivals} load test users..."):
+                    load_test_users = generate_load_test_users(num_arrivals, org_desired_name, desired_org_types)
+                
+                load_progress = st.progress(0)
+                load_status = st.empty()
+                
+                def update_load_progress(done, total):
+                    load_progress.progress(done / total)
+                    load_status.text(f"📤 Dispatched {done}/{total} arrivals...")
+                
+                st.session_state.load_test_results = run_load_test(
+                    load_test_url.rstrip("/"), load_test_users, load_test_rate, load_test_duration,
+                    max_workers=int(load_test_workers), timeout=load_test_timeout,
+                    on_progress=update_load_progress
+                )
+                load_progress.empty()
+                load_status.empty()
+            except Exception as e:
+                st.error(f"Load test error: {str(e)}")
+    
+    if 'load_test_results' in st.session_state:
+        show_load_test_results(st.session_state.load_test_results)
+    
+    if benchmark_button:
+        if not desired_org_types:
+            st.error("Please select at least one organization type.")
+        else:
+            try:
+                with st.spinner("Benchmarking deployment backends..."):
+                    st.session_state.backend_benchmark = benchmark_deploy_backends(
+                        load_test_url.rstrip("/"),
+                        max(1, int(load_test_rate * load_test_duration)),
+                        int(load_test_workers),
+                        desired_org_types,
+                        known_users if use_known_users else None
+                    )
+            except Exception as e:
+                st.error(f"Benchmark error: {str(e)}")
+    
+    if 'backend_benchmark' in st.session_state:
+        st.subheader("⚖️ Deployment Backend Comparison")
+        st.dataframe(pd.DataFrame(st.session_state.backend_benchmark).round(2), use_container_width=True)
+    
     # Show persistent credentials section (always visible if credentials exist)
     show_persistent_credentials()
     
+    # Show last recorded pipeline trace
+    show_pipeline_trace()
+    
     # Display generated data
     if 'employees' in st.session_state:
         st.markdown("---")
@@ -793,17 +1668,11 @@ def main():
         
         # Summary statistics
         col1, col2, col3, col4, col5, col6 = st.columns(6)
-        role_counts = {}
-        db_status_counts = {}
-        cognito_status_counts = {}
-        for emp in st.session_state.employees:
-            role = emp['Role Type']
-            db_status = emp.get('DB Status', 'Generated')
-            cognito_status = emp.get('Cognito Status', 'Pending')
-            role_counts[role] = role_counts.get(role, 0) + 1
-            db_status_counts[db_status] = db_status_counts.get(db_status, 0) + 1
-            cognito_status_counts[cognito_status] = cognito_status_counts.get(cognito_status, 0) + 1
-            
+        role_counts = count_employee_values(st.session_state.employees, 'Role Type')
+        org_type_counts = count_employee_values(st.session_state.employees, 'Org Type')
+        db_status_counts = count_employee_values(st.session_state.employees, 'DB Status', 'Generated')
+        cognito_status_counts = count_employee_values(st.session_state.employees, 'Cognito Status', 'Pending')
+        
         with col1:
             st.metric("Total Employees", len(st.session_state.employees))
         with col2:
@@ -823,7 +1692,7 @@ def main():
         with col1:
             role_filter = st.selectbox("Filter by Role", ["All"] + list(role_counts.keys()))
         with col2:
-            org_type_filter = st.selectbox("Filter by Org Type", ["All"] + desired_org_types)
+            org_type_filter = st.selectbox("Filter by Org Type", ["All"] + list(org_type_counts.keys()))
         with col3:
             db_status_filter = st.selectbox("Filter by DB Status", ["All"] + list(db_status_counts.keys()))
         with col4:
@@ -834,27 +1703,46 @@ def main():
         # Apply filters
         filtered_employees = st.session_state.employees
         if role_filter != "All":
-            filtered_employees = [emp for emp in filtered_employees if emp['Role Type'] == role_filter]
+            filtered_employees = filter_employees(filtered_employees, 'Role Type', role_filter)
         if org_type_filter != "All":
-            filtered_employees = [emp for emp in filtered_employees if emp['Org Type'] == org_type_filter]
+            filtered_employees = filter_employees(filtered_employees, 'Org Type', org_type_filter)
         if db_status_filter != "All":
-            filtered_employees = [emp for emp in filtered_employees if emp.get('DB Status', 'Generated') == db_status_filter]
+            filtered_employees = filter_employees(filtered_employees, 'DB Status', db_status_filter, 'Generated')
         if cognito_status_filter != "All":
-            filtered_employees = [emp for emp in filtered_employees if emp.get('Cognito Status', 'Pending') == cognito_status_filter]
+            filtered_employees = filter_employees(filtered_employees, 'Cognito Status', cognito_status_filter, 'Pending')
+        
+        # Only the visible page is materialized for snapshot-backed datasets
+        page_start = 0
+        page_size = len(filtered_employees)
+        if len(filtered_employees) > 100:
+            col1, col2 = st.columns(2)
+            with col1:
+                page_size = st.selectbox("Rows per page", [25, 50, 100, 250, 1000], index=2)
+            with col2:
+                page_count = math.ceil(len(filtered_employees) / page_size)
+                page = st.number_input(f"Page (of {page_count:,})", min_value=1, max_value=page_count, value=1)
+            page_start = (page - 1) * page_size
+        visible_employees = filtered_employees[page_start:page_start + page_size]
         
         # Display results
-        st.subheader(f"📋 Employee Details ({len(filtered_employees)} shown)")
+        if len(visible_employees) < len(filtered_employees):
+            st.subheader(
+                f"📋 Employee Details ({page_start + 1:,}-{page_start + len(visible_employees):,} "
+                f"of {len(filtered_employees):,} shown)"
+            )
+        else:
+            st.subheader(f"📋 Employee Details ({len(filtered_employees)} shown)")
         
         if show_details:
             # Detailed card view
-            for i, employee in enumerate(filtered_employees):
+            for i, employee in enumerate(visible_employees, start=page_start):
                 display_employee_card(employee, i)
         else:
             # Table view
-            if filtered_employees:
+            if visible_employees:
                 # Prepare data for table (exclude API data and temp password)
                 table_data = []
-                for emp in filtered_employees:
+                for emp in visible_employees:
                     table_emp = {k: v for k, v in emp.items() if k not in ['api_data', 'Temporary Password']}
                     table_data.append(table_emp)
                 df = pd.DataFrame(table_data)
@@ -0,0 +1,200 @@
+"""Per-endpoint circuit breakers for the onboarding API"""
+
+import collections
+import threading
+import time
+from contextlib import contextmanager
+
+
+class CircuitBreaker:
+    """Per-endpoint circuit breaker with closed, open and half-open states
+
+    Over the last `window` calls, errors and calls slower than
+    slow_call_seconds count as failures. Once at least min_calls were made and
+    the failure rate reaches failure_rate_threshold the breaker opens and
+    rejects calls for cooldown_seconds. It then goes half-open and lets a
+    single probe through: success closes it, failure opens it again.
+
+    allow_request() returns a token naming the state the call was let through
+    in, to be passed back to record(). Every state change starts a new
+    generation, so results of calls admitted earlier (e.g. slow closed-state
+    calls finishing while the breaker is half-open) are dropped and only the
+    probe decides whether a half-open breaker closes.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, name, failure_rate_threshold=0.5, slow_call_seconds=10.0, window=20,
+                 min_calls=5, cooldown_seconds=30.0):
+        self.name = name
+        self.settings = {
+            "failure_rate_threshold": failure_rate_threshold,
+            "slow_call_seconds": slow_call_seconds,
+            "window": window,
+            "min_calls": min_calls,
+            "cooldown_seconds": cooldown_seconds
+        }
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.min_calls = min_calls
+        self.cooldown_seconds = cooldown_seconds
+        self._calls = collections.deque(maxlen=window)  # True for failed or slow calls
+        self._state = self.CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._generation = 1
+        self.times_opened = 0
+        self.queued = 0  # Callers currently waiting for the breaker to let them through
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        self._state = state
+        self._generation += 1
+
+    def _refresh_state(self):
+        if self._state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+            self._set_state(self.HALF_OPEN)
+            self._probe_in_flight = False
+
+    @property
+    def state(self):
+        with self._lock:
+            self._refresh_state()
+            return self._state
+
+    def allow_request(self):
+        """Return a token for record() if a call may be sent now, else None
+
+        Claims the probe when half-open.
+        """
+        with self._lock:
+            self._refresh_state()
+            if self._state == self.CLOSED:
+                return self._generation
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return self._generation
+            return None
+
+    def retry_in(self):
+        """Seconds until an open breaker lets a probe through"""
+        with self._lock:
+            self._refresh_state()
+            if self._state != self.OPEN:
+                return 0.0
+            return max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+
+    @contextmanager
+    def waiting(self):
+        """Count the calling user as queued on this breaker while the block runs"""
+        with self._lock:
+            self.queued += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.queued -= 1
+
+    def record(self, success, duration, token):
+        """Record the result of a call let through by allow_request() with token
+
+        Returns True if the call was the half-open probe, so callers can
+        retry a user whose failed probe reopened the breaker.
+        """
+        failed = not success or duration >= self.slow_call_seconds
+        with self._lock:
+            if token != self._generation:
+                return False  # Admitted before the last state change
+            if self._state == self.HALF_OPEN:
+                self._probe_in_flight = False
+                if failed:
+                    self._open()
+                else:
+                    self._set_state(self.CLOSED)
+                    self._calls.clear()
+                return True
+            self._calls.append(failed)
+            if (
+                self._state == self.CLOSED
+                and len(self._calls) >= self.min_calls
+                and sum(self._calls) / len(self._calls) >= self.failure_rate_threshold
+            ):
+                self._open()
+            return False
+
+    def _open(self):
+        self._set_state(self.OPEN)
+        self._opened_at = time.monotonic()
+        self.times_opened += 1
+
+    def snapshot(self):
+        """Plain-dict copy of the breaker status that can cross process boundaries"""
+        with self._lock:
+            self._refresh_state()
+            retry_in = 0.0
+            if self._state == self.OPEN:
+                retry_in = max(0.0, self.cooldown_seconds - (time.monotonic() - self._opened_at))
+            return {
+                "name": self.name,
+                "state": self._state,
+                "times_opened": self.times_opened,
+                "queued": self.queued,
+                "retry_in": retry_in
+            }
+
+    def describe(self):
+        """Short status text for the UI"""
+        return describe_breaker(self.snapshot())
+
+
+# Flow stages guarded by a circuit breaker and the endpoint each one calls
+BREAKER_ENDPOINTS = {"db": "/onboard-user/", "cognito": "/cognito/onboard"}
+
+
+def create_circuit_breakers(**settings):
+    """One circuit breaker per onboarding endpoint, keyed by flow stage"""
+    return {stage: CircuitBreaker(endpoint, **settings) for stage, endpoint in BREAKER_ENDPOINTS.items()}
+
+
+def circuit_open_response(breaker):
+    """call_api_endpoint-style failure for a request that was never sent"""
+    return {"success": False, "error": f"Circuit open for {breaker.name}: endpoint unavailable"}
+
+
+def breaker_snapshots(breakers):
+    """Snapshot of every breaker, keyed by flow stage"""
+    return {stage: breaker.snapshot() for stage, breaker in (breakers or {}).items()}
+
+
+def merge_breaker_snapshots(snapshot_sets):
+    """Combine breaker snapshots of several processes into one per stage
+
+    Openings and queued users are summed; the state is the least healthy
+    one and retry_in the longest wait.
+    """
+    severity = [CircuitBreaker.CLOSED, CircuitBreaker.HALF_OPEN, CircuitBreaker.OPEN]
+    merged = {}
+    for snapshots in snapshot_sets:
+        for stage, snapshot in snapshots.items():
+            current = merged.get(stage)
+            if current is None:
+                merged[stage] = dict(snapshot)
+                continue
+            if severity.index(snapshot["state"]) > severity.index(current["state"]):
+                current["state"] = snapshot["state"]
+            current["times_opened"] += snapshot["times_opened"]
+            current["queued"] += snapshot["queued"]
+            current["retry_in"] = max(current["retry_in"], snapshot["retry_in"])
+    return merged
+
+
+def describe_breaker(snapshot):
+    """Short status text for the UI from a breaker snapshot"""
+    queued = f", {snapshot['queued']} queued" if snapshot["queued"] else ""
+    if snapshot["state"] == CircuitBreaker.OPEN:
+        return f"🔴 {snapshot['name']}: open (retry in {snapshot['retry_in']:.0f}s{queued})"
+    if snapshot["state"] == CircuitBreaker.HALF_OPEN:
+        return f"🟡 {snapshot['name']}: half-open (probing{queued})"
+    return f"🟢 {snapshot['name']}: closed"
@@ -0,0 +1,400 @@
+"""Headless deployment of one organization with a choice of backends
+
+Every backend runs the org steps and then the same per-user onboarding flow:
+threaded (a thread pool), async (one event loop with aiohttp), processes
+(sharded worker processes over a SQLite queue) or bulk (compact batches to
+the bulk endpoints). None of them make UI calls.
+"""
+
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from circuit_breaker import breaker_snapshots, circuit_open_response
+from deploy_workers import DEPLOY_QUEUE_PATH, WorkQueue, run_worker_pool
+from onboarding import (
+    call_api_endpoint, create_org_mappings, create_organization, onboard_user, onboard_user_async,
+    onboard_user_flow, resolve_user_outcome, send_flow_request, wait_for_breaker
+)
+from tracing import NULL_TRACER
+from wire_format import RequestEncoder, encode_compact_batch
+
+
+# Bulk onboarding endpoints per flow stage; they take a compact batch of user requests
+BULK_ENDPOINTS = {"db": "/onboard-users/bulk", "cognito": "/cognito/onboard/bulk"}
+
+
+def summarize_user_results(user_results):
+    """Count DB and Cognito outcomes across per-user results"""
+    successful_db_users = sum(1 for result in user_results if result["db_status"] == "Success")
+    return {
+        "successful_db_users": successful_db_users,
+        "failed_db_users": len(user_results) - successful_db_users,
+        "new_cognito_users": sum(1 for result in user_results if result["cognito_status"] == "success"),
+        "existing_cognito_users": sum(1 for result in user_results if result["cognito_status"] == "exists"),
+        "requests_skipped": sum(result.get("requests_skipped", 0) for result in user_results),
+        "bytes_raw": sum(result.get("bytes_raw", 0) for result in user_results),
+        "bytes_sent": sum(result.get("bytes_sent", 0) for result in user_results)
+    }
+
+
+def new_org_result(org_name):
+    """Empty per-organization deployment result"""
+    return {
+        "org_name": org_name,
+        "deployment_status": [],
+        "user_results": [],
+        "credentials": [],
+        "org_calls_skipped": 0
+    }
+
+
+def run_org_steps(org_result, org_name, org_types, api_base_url, deployment_cache=None, tracer=None):
+    """Create the org and its mappings, recording steps on org_result
+
+    Returns False if a step failed and users should not be onboarded.
+    """
+    for step_fn, step_args in (
+        (create_organization, (org_name, api_base_url, deployment_cache, tracer)),
+        (create_org_mappings, (org_name, org_types, api_base_url, deployment_cache, tracer))
+    ):
+        step, _ = step_fn(*step_args)
+        org_result["deployment_status"].append(step)
+        if step["status"] == "Cached":
+            org_result["org_calls_skipped"] += 1
+        if step["status"] == "Failed":
+            return False
+    return True
+
+
+def apply_user_outcomes(org_result, employees, outcomes, tracer=None):
+    """Resolve onboarding outcomes in roster order and record them on org_result"""
+    record_resolved_users(
+        org_result, employees,
+        [resolve_user_outcome(employee["api_data"], outcome, tracer) for employee, outcome in zip(employees, outcomes)]
+    )
+
+
+def record_resolved_users(org_result, employees, resolved_users):
+    """Update employee records and org_result from resolved outcomes in roster order"""
+    for employee, resolved in zip(employees, resolved_users):
+        employee.update(resolved["employee_updates"])
+        if resolved["credential"]:
+            org_result["credentials"].append(resolved["credential"])
+        org_result["user_results"].append(resolved["result"])
+    org_result["deployment_status"].extend(org_result["user_results"])
+
+
+def deploy_org_headless(org_config, api_base_url, deployment_cache=None, known_users=None,
+                        tracer=None, max_workers=1, breakers=None, max_queue_wait=600, encoder=None):
+    """Deploy one organization and its employees without any UI calls
+
+    org_config is a dict with org_name, org_types and employees. Safe to run
+    from worker threads; employee records are updated in place. With
+    max_workers > 1 users are onboarded on a thread pool. With breakers,
+    users wait for an open endpoint to recover (see onboard_user).
+    """
+    org_name = org_config["org_name"]
+    employees = org_config["employees"]
+    tracer = tracer or NULL_TRACER
+
+    org_result = new_org_result(org_name)
+    if not run_org_steps(org_result, org_name, org_config["org_types"], api_base_url, deployment_cache, tracer):
+        return org_result
+
+    def onboard(employee):
+        user_data = employee["api_data"]
+        with tracer.span("onboard_user", email=user_data["email"], org_name=org_name):
+            return onboard_user(
+                user_data, api_base_url, known_users=known_users, tracer=tracer,
+                breakers=breakers, max_queue_wait=max_queue_wait, encoder=encoder
+            )
+
+    if max_workers > 1:
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="user-onboard") as executor:
+            outcomes = list(executor.map(onboard, employees))
+    else:
+        outcomes = [onboard(employee) for employee in employees]
+
+    apply_user_outcomes(org_result, employees, outcomes, tracer)
+    return org_result
+
+
+async def deploy_org_async(org_config, api_base_url, concurrency=100, deployment_cache=None,
+                           known_users=None, tracer=None, breakers=None, max_queue_wait=600, encoder=None):
+    """Async counterpart of deploy_org_headless
+
+    Runs the same org -> mappings -> per-user DB -> Cognito flow on one event
+    loop with non-blocking HTTP; a semaphore caps in-flight users. Known-users
+    entries are read before and written after the run on a worker thread, so
+    the event loop never waits on SQLite.
+    """
+    org_name = org_config["org_name"]
+    employees = org_config["employees"]
+    tracer = tracer or NULL_TRACER
+
+    org_result = new_org_result(org_name)
+    org_steps_ok = await asyncio.to_thread(
+        run_org_steps, org_result, org_name, org_config["org_types"], api_base_url, deployment_cache, tracer
+    )
+    if not org_steps_ok:
+        return org_result
+
+    known_users_batch = None
+    if known_users:
+        with tracer.span("known_users_preload", category="cache", users=len(employees)):
+            known_users_batch = await asyncio.to_thread(
+                known_users.preload, api_base_url, [employee["api_data"]["email"] for employee in employees]
+            )
+
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    try:
+        async with aiohttp.ClientSession(connector=connector) as session:
+            async def onboard(employee):
+                user_data = employee["api_data"]
+                async with semaphore:
+                    with tracer.async_span("onboard_user", user_data["email"], org_name=org_name):
+                        return await onboard_user_async(
+                            session, user_data, api_base_url, known_users_batch, tracer, breakers,
+                            max_queue_wait, encoder
+                        )
+
+            outcomes = await asyncio.gather(*(onboard(employee) for employee in employees))
+    finally:
+        if known_users_batch:
+            with tracer.span("known_users_flush", category="cache", users=len(known_users_batch.pending)):
+                await asyncio.to_thread(known_users_batch.flush)
+
+    apply_user_outcomes(org_result, employees, outcomes, tracer)
+    return org_result
+
+
+def deploy_org_processes(org_config, api_base_url, num_workers=4, deployment_cache=None,
+                         known_users=None, tracer=None, on_progress=None, breakers=None,
+                         max_queue_wait=600, encoder=None, threads_per_worker=8, on_breakers=None):
+    """Deploy one organization with a pool of worker processes
+
+    Org steps run here; users are sharded by email hash into a durable SQLite
+    queue and drained by one process per shard, so JSON encoding, response
+    parsing and credential building scale across cores. Each process keeps
+    threads_per_worker users in flight and stores every result (temporary
+    password included) as soon as its user finishes. on_progress receives
+    the queue counts while workers run. Each worker builds its own breakers
+    and request encoder with the same settings as the given ones; with
+    breakers, on_breakers receives the workers' merged breaker snapshots
+    while they run and org_result["breakers"] holds the final ones.
+    """
+    org_name = org_config["org_name"]
+    employees = org_config["employees"]
+    tracer = tracer or NULL_TRACER
+
+    org_result = new_org_result(org_name)
+    if not run_org_steps(org_result, org_name, org_config["org_types"], api_base_url, deployment_cache, tracer):
+        return org_result
+
+    known_users_config = None
+    if known_users:
+        known_users_config = {
+            "path": known_users.path,
+            "ttl_seconds": known_users.ttl_seconds,
+            "bypass": known_users.bypass
+        }
+
+    breaker_config = None
+    if breakers:
+        breaker_config = {"settings": breakers["db"].settings, "max_queue_wait": max_queue_wait}
+
+    queue = WorkQueue(DEPLOY_QUEUE_PATH)
+    job_id = queue.enqueue([employee["api_data"] for employee in employees], num_workers)
+    with tracer.span("worker_pool", workers=num_workers, threads_per_worker=threads_per_worker, users=len(employees)):
+        run_worker_pool(
+            queue, job_id, num_workers, api_base_url, threads_per_worker,
+            known_users_config=known_users_config, breaker_config=breaker_config,
+            encoder_config=encoder.config() if encoder else None, on_progress=on_progress,
+            on_breakers=on_breakers if breakers else None
+        )
+    resolved_by_position = dict(queue.results(job_id))
+    if breakers:
+        org_result["breakers"] = queue.breaker_snapshots(job_id)
+
+    resolved_users = []
+    for position, employee in enumerate(employees):
+        resolved = resolved_by_position.get(position)
+        if resolved is None:
+            user_data = employee["api_data"]
+            resolved = {
+                "employee_updates": {"DB Status": "Failed ❌", "Cognito Status": "Skipped"},
+                "result": {
+                    "name": f"{user_data['first_name']} {user_data['last_name']}",
+                    "db_status": "Failed",
+                    "cognito_status": "Skipped",
+                    "message": "Worker process did not finish this user",
+                    "requests_skipped": 0,
+                    "bytes_raw": 0,
+                    "bytes_sent": 0
+                },
+                "credential": None
+            }
+        resolved_users.append(resolved)
+    record_resolved_users(org_result, employees, resolved_users)
+
+    if len(resolved_by_position) == len(employees):
+        queue.delete_job(job_id)
+    queue.close()
+    return org_result
+
+
+def send_bulk_requests(requests_batch, api_base_url, encoder, breaker=None, max_queue_wait=600, tracer=None):
+    """Send same-stage flow requests as one compact batch to the stage's bulk endpoint
+
+    Returns one call_api_endpoint-style response per request; bytes_raw is
+    each user's plain JSON body and the batch body is split evenly for
+    bytes_sent. Hosts without the bulk endpoint (404) are remembered on the
+    encoder and their requests are sent one by one instead. Each HTTP call
+    is traced on its own, so breaker waits are not counted as request time.
+    """
+    tracer = tracer or NULL_TRACER
+    stage = requests_batch[0][0]
+    if encoder.bulk_supported(api_base_url):
+        deadline = time.monotonic() + max_queue_wait
+        records = [data for _, _, data in requests_batch]
+        while True:
+            token = wait_for_breaker(breaker, deadline - time.monotonic()) if breaker else None
+            if breaker and token is None:
+                return [circuit_open_response(breaker) for _ in requests_batch]
+
+            start = time.perf_counter()
+            with tracer.span("bulk_request", stage=stage, users=len(records)):
+                response = call_api_endpoint(
+                    f"{api_base_url}{BULK_ENDPOINTS[stage]}", encode_compact_batch(records), encoder=encoder
+                )
+            results = response["data"].get("results", []) if response["success"] else []
+            if response["success"] and len(results) != len(records):
+                response = {
+                    "success": False,
+                    "error": f"Bulk endpoint returned {len(results)} results for {len(records)} users",
+                    "bytes_sent": response["bytes_sent"]
+                }
+            bulk_missing = response.get("status_code") == 404
+            healthy = response["success"] or bulk_missing
+            # A missing bulk endpoint says nothing about the health of the service
+            if breaker and breaker.record(healthy, time.perf_counter() - start, token) and not healthy:
+                continue  # The batch was the half-open probe: wait for the breaker again
+            break
+
+        if bulk_missing:
+            encoder.mark_bulk_unsupported(api_base_url)
+        else:
+            share, remainder = divmod(response.get("bytes_sent", 0), len(records))
+            responses = []
+            for k, record in enumerate(records):
+                if response["success"]:
+                    user_response = {"success": True, "data": results[k]}
+                else:
+                    user_response = {"success": False, "error": response["error"]}
+                user_response["bytes_raw"] = len(json.dumps(record).encode("utf-8"))
+                user_response["bytes_sent"] = share + (1 if k < remainder else 0)
+                responses.append(user_response)
+            return responses
+
+    responses = []
+    for request in requests_batch:
+        deadline = time.monotonic() + max_queue_wait
+        response = None
+        while response is None:  # A failed probe waits for the breaker again
+            token = wait_for_breaker(breaker, deadline - time.monotonic()) if breaker else None
+            if breaker and token is None:
+                response = circuit_open_response(breaker)
+            else:
+                response = send_flow_request(request, breaker, encoder=encoder, token=token, tracer=tracer)
+        responses.append(response)
+    return responses
+
+
+def deploy_org_bulk(org_config, api_base_url, batch_size=100, deployment_cache=None, known_users=None,
+                    tracer=None, breakers=None, max_queue_wait=600, encoder=None):
+    """Deploy one organization sending users to the bulk endpoints in batches
+
+    Every user's onboarding flow is advanced in lockstep: all pending DB
+    requests go out in compact batches of batch_size, then the Cognito
+    requests of the users whose DB step succeeded. Falls back to per-user
+    requests if the server has no bulk endpoints. Tracing records one span
+    per bulk request rather than per-user spans.
+    """
+    org_name = org_config["org_name"]
+    employees = org_config["employees"]
+    tracer = tracer or NULL_TRACER
+    encoder = encoder or RequestEncoder(compression=None)
+
+    org_result = new_org_result(org_name)
+    if not run_org_steps(org_result, org_name, org_config["org_types"], api_base_url, deployment_cache, tracer):
+        return org_result
+
+    flows = [onboard_user_flow(employee["api_data"], api_base_url, known_users, tracer) for employee in employees]
+    outcomes = [None] * len(flows)
+    pending = {}
+
+    def advance(i, response=None):
+        try:
+            pending[i] = next(flows[i]) if response is None else flows[i].send(response)
+        except StopIteration as stop:
+            outcomes[i] = stop.value
+
+    for i in range(len(flows)):
+        advance(i)
+
+    for stage in BULK_ENDPOINTS:
+        indexes = [i for i, request in pending.items() if request[0] == stage]
+        breaker = breakers.get(stage) if breakers else None
+        for start in range(0, len(indexes), batch_size):
+            batch = indexes[start:start + batch_size]
+            responses = send_bulk_requests(
+                [pending.pop(i) for i in batch], api_base_url, encoder, breaker, max_queue_wait, tracer
+            )
+            for i, response in zip(batch, responses):
+                advance(i, response)
+
+    apply_user_outcomes(org_result, employees, outcomes, tracer)
+    return org_result
+
+
+def deploy_org_with_backend(org_config, api_base_url, backend="threaded", concurrency=16,
+                            deployment_cache=None, known_users=None, tracer=None, on_progress=None,
+                            breakers=None, max_queue_wait=600, encoder=None, threads_per_worker=8,
+                            on_breakers=None):
+    """Deploy one organization with the threaded, async, multi-process or bulk backend
+
+    For the multi-process backend concurrency is the number of worker
+    processes, each running threads_per_worker threads; for the bulk backend
+    it is the batch size. With breakers, org_result["breakers"] holds the
+    final breaker snapshots; the worker processes have their own breakers,
+    so only that backend calls on_breakers with live snapshots (the others
+    update the given breakers in place).
+    """
+    if backend == "processes":
+        return deploy_org_processes(
+            org_config, api_base_url, concurrency, deployment_cache, known_users, tracer, on_progress,
+            breakers, max_queue_wait, encoder, threads_per_worker, on_breakers
+        )
+    if backend == "bulk":
+        org_result = deploy_org_bulk(
+            org_config, api_base_url, concurrency, deployment_cache, known_users, tracer,
+            breakers, max_queue_wait, encoder
+        )
+    elif backend == "async":
+        org_result = asyncio.run(deploy_org_async(
+            org_config, api_base_url, concurrency, deployment_cache, known_users, tracer,
+            breakers, max_queue_wait, encoder
+        ))
+    else:
+        org_result = deploy_org_headless(
+            org_config, api_base_url, deployment_cache, known_users, tracer, max_workers=concurrency,
+            breakers=breakers, max_queue_wait=max_queue_wait, encoder=encoder
+        )
+    if breakers:
+        org_result["breakers"] = breaker_snapshots(breakers)
+    return org_result
@@ -0,0 +1,356 @@
+"""Persistent SQLite caches of deployment state shared across runs
+
+DeploymentCache remembers created organizations and mapped org types so
+repeat deployments can skip the org steps. KnownUsersCache remembers which
+users already exist in the DB and in Cognito (with a Bloom filter in front
+of SQLite); KnownUsersView applies one session's TTL and bypass settings to
+the shared store and KnownUsersBatch buffers a whole run's lookups and
+writes for the async backend.
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+
+# Local cache of deployment state (orgs, mappings) shared across runs
+DEPLOY_CACHE_PATH = os.environ.get("DEPLOY_CACHE_PATH", ".deploy_cache.db")
+
+
+class DeploymentCache:
+    """Persistent SQLite cache of org-level deployment state
+
+    Remembers which organizations were created and which org types were
+    mapped per API base URL, so repeat deployments can skip /org/ and
+    /create-org-mappings/ entirely.
+    """
+
+    def __init__(self, path=DEPLOY_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._execute_script("""
+            CREATE TABLE IF NOT EXISTS orgs (
+                api_base_url TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                org_id TEXT,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (api_base_url, org_name)
+            );
+            CREATE TABLE IF NOT EXISTS org_mappings (
+                api_base_url TEXT NOT NULL,
+                org_name TEXT NOT NULL,
+                org_type TEXT NOT NULL,
+                mapped_at TEXT NOT NULL,
+                PRIMARY KEY (api_base_url, org_name, org_type)
+            );
+        """)
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _execute_script(self, script):
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.executescript(script)
+                conn.commit()
+            finally:
+                conn.close()
+
+    def _execute(self, sql, params=(), many=False):
+        """Run a statement in its own connection (safe across threads)"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    if many:
+                        cursor = conn.executemany(sql, params)
+                    else:
+                        cursor = conn.execute(sql, params)
+                    return cursor.fetchall()
+            finally:
+                conn.close()
+
+    def get_org(self, api_base_url, org_name):
+        """Return the cached org entry or None if it was never created"""
+        rows = self._execute(
+            "SELECT org_id, created_at FROM orgs WHERE api_base_url = ? AND org_name = ?",
+            (api_base_url, org_name)
+        )
+        if not rows:
+            return None
+        return {"org_id": rows[0][0], "created_at": rows[0][1]}
+
+    def remember_org(self, api_base_url, org_name, org_id=None):
+        """Record that an organization exists on the given API"""
+        self._execute(
+            "INSERT OR REPLACE INTO orgs (api_base_url, org_name, org_id, created_at) VALUES (?, ?, ?, ?)",
+            (api_base_url, org_name, None if org_id is None else str(org_id), datetime.now().isoformat())
+        )
+
+    def get_mapped_org_types(self, api_base_url, org_name):
+        """Return the set of org types already mapped to the organization"""
+        rows = self._execute(
+            "SELECT org_type FROM org_mappings WHERE api_base_url = ? AND org_name = ?",
+            (api_base_url, org_name)
+        )
+        return {row[0] for row in rows}
+
+    def remember_org_types(self, api_base_url, org_name, org_types):
+        """Record that org types are mapped to the organization"""
+        mapped_at = datetime.now().isoformat()
+        self._execute(
+            "INSERT OR REPLACE INTO org_mappings (api_base_url, org_name, org_type, mapped_at) VALUES (?, ?, ?, ?)",
+            [(api_base_url, org_name, org_type, mapped_at) for org_type in org_types],
+            many=True
+        )
+
+    def stats(self):
+        """Return counts of cached entries"""
+        return {
+            "orgs": self._execute("SELECT COUNT(*) FROM orgs")[0][0],
+            "org_mappings": self._execute("SELECT COUNT(*) FROM org_mappings")[0][0]
+        }
+
+    def clear(self):
+        """Drop all cached entries"""
+        self._execute_script("DELETE FROM orgs; DELETE FROM org_mappings;")
+
+
+class BloomFilter:
+    """Small in-memory Bloom filter used to avoid SQLite lookups for unknown keys"""
+
+    def __init__(self, capacity=100000, error_rate=0.01):
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, key):
+        # Double hashing: derive k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class KnownUsersCache:
+    """Persistent cache of emails known to exist in the DB and in Cognito
+
+    Entries are stored in SQLite (same file as DeploymentCache) and fronted
+    by a Bloom filter so unknown emails never hit the database. The store is
+    shared between sessions and holds no per-session settings; lookups take
+    the TTL to apply (see KnownUsersView).
+    """
+
+    def __init__(self, path=DEPLOY_CACHE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        conn = self._connect()
+        try:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS known_users (
+                    api_base_url TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    in_db INTEGER NOT NULL DEFAULT 0,
+                    in_cognito INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (api_base_url, email)
+                );
+            """)
+            rows = conn.execute("SELECT api_base_url, email FROM known_users").fetchall()
+        finally:
+            conn.close()
+        self._bloom = BloomFilter(capacity=max(100000, 2 * len(rows)))
+        for api_base_url, email in rows:
+            self._bloom.add(self._key(api_base_url, email))
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def _key(api_base_url, email):
+        return f"{api_base_url}|{email.lower()}"
+
+    def lookup(self, api_base_url, email, ttl_seconds):
+        """Return {"in_db": bool, "in_cognito": bool} for an entry newer than ttl_seconds, else None"""
+        key = self._key(api_base_url, email)
+        with self._lock:
+            if key not in self._bloom:
+                return None
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT in_db, in_cognito, updated_at FROM known_users WHERE api_base_url = ? AND email = ?",
+                    (api_base_url, email.lower())
+                ).fetchone()
+            finally:
+                conn.close()
+        if row is None or time.time() - row[2] > ttl_seconds:
+            return None
+        return {"in_db": bool(row[0]), "in_cognito": bool(row[1])}
+
+    def lookup_many(self, api_base_url, emails, ttl_seconds):
+        """lookup for many emails with one query per 500; returns {lowercased email: entry}"""
+        with self._lock:
+            candidates = [
+                email.lower() for email in emails if self._key(api_base_url, email) in self._bloom
+            ]
+            rows = []
+            if candidates:
+                conn = self._connect()
+                try:
+                    for start in range(0, len(candidates), 500):
+                        chunk = candidates[start:start + 500]
+                        rows.extend(conn.execute(
+                            "SELECT email, in_db, in_cognito, updated_at FROM known_users "
+                            f"WHERE api_base_url = ? AND email IN ({', '.join('?' * len(chunk))})",
+                            (api_base_url, *chunk)
+                        ).fetchall())
+                finally:
+                    conn.close()
+        now = time.time()
+        return {
+            email: {"in_db": bool(in_db), "in_cognito": bool(in_cognito)}
+            for email, in_db, in_cognito, updated_at in rows
+            if now - updated_at <= ttl_seconds
+        }
+
+    def remember(self, api_base_url, email, in_db=False, in_cognito=False):
+        """Record that a user exists in the DB and/or Cognito"""
+        self.remember_many([(api_base_url, email, in_db, in_cognito)])
+
+    def remember_many(self, entries):
+        """remember for (api_base_url, email, in_db, in_cognito) entries in one transaction"""
+        if not entries:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.executemany(
+                        """
+                        INSERT INTO known_users (api_base_url, email, in_db, in_cognito, updated_at)
+                        VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT (api_base_url, email) DO UPDATE SET
+                            in_db = MAX(in_db, excluded.in_db),
+                            in_cognito = MAX(in_cognito, excluded.in_cognito),
+                            updated_at = excluded.updated_at
+                        """,
+                        (
+                            (api_base_url, email.lower(), int(in_db), int(in_cognito), now)
+                            for api_base_url, email, in_db, in_cognito in entries
+                        )
+                    )
+            finally:
+                conn.close()
+            for api_base_url, email, _, _ in entries:
+                self._bloom.add(self._key(api_base_url, email))
+
+    def stats(self):
+        """Return counts of cached users"""
+        conn = self._connect()
+        try:
+            total, in_db, in_cognito = conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(in_db), 0), COALESCE(SUM(in_cognito), 0) FROM known_users"
+            ).fetchone()
+        finally:
+            conn.close()
+        return {"users": total, "in_db": in_db, "in_cognito": in_cognito}
+
+    def purge_expired(self, ttl_seconds):
+        """Delete entries older than ttl_seconds"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM known_users WHERE updated_at < ?", (time.time() - ttl_seconds,))
+            finally:
+                conn.close()
+
+    def clear(self):
+        """Drop all cached users"""
+        with self._lock:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("DELETE FROM known_users")
+            finally:
+                conn.close()
+            self._bloom = BloomFilter()
+
+
+class KnownUsersView:
+    """One session's TTL and bypass settings over the shared KnownUsersCache
+
+    Settings live here rather than on the shared store, so sessions with
+    different settings do not affect each other's deployments. bypass turns
+    lookups off while still recording new results.
+    """
+
+    def __init__(self, store, ttl_seconds=24 * 3600, bypass=False):
+        self.store = store
+        self.path = store.path
+        self.ttl_seconds = ttl_seconds
+        self.bypass = bypass
+
+    def lookup(self, api_base_url, email):
+        if self.bypass:
+            return None
+        return self.store.lookup(api_base_url, email, self.ttl_seconds)
+
+    def remember(self, api_base_url, email, in_db=False, in_cognito=False):
+        self.store.remember(api_base_url, email, in_db=in_db, in_cognito=in_cognito)
+
+    def stats(self):
+        return self.store.stats()
+
+    def preload(self, api_base_url, emails):
+        """KnownUsersBatch with the entries of these emails read up front"""
+        entries = {} if self.bypass else self.store.lookup_many(api_base_url, emails, self.ttl_seconds)
+        return KnownUsersBatch(self.store, api_base_url, entries)
+
+    def purge_expired(self):
+        self.store.purge_expired(self.ttl_seconds)
+
+    def clear(self):
+        self.store.clear()
+
+
+class KnownUsersBatch:
+    """Known-users entries for one deployment, read up front and written back at the end
+
+    Used where SQLite calls must not block, such as the async backend's
+    event loop: lookup() only reads the preloaded entries and remember()
+    buffers until flush().
+    """
+
+    def __init__(self, store, api_base_url, entries):
+        self.store = store
+        self.api_base_url = api_base_url
+        self.entries = entries
+        self.pending = []
+
+    def lookup(self, api_base_url, email):
+        if api_base_url != self.api_base_url:
+            return None
+        return self.entries.get(email.lower())
+
+    def remember(self, api_base_url, email, in_db=False, in_cognito=False):
+        self.pending.append((api_base_url, email, in_db, in_cognito))
+
+    def flush(self):
+        """Write buffered results to the store"""
+        pending, self.pending = self.pending, []
+        self.store.remember_many(pending)
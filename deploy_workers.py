@@ -0,0 +1,304 @@
+"""Multi-process deployment workers coordinated through a local SQLite queue
+
+The parent process enqueues users sharded by email hash, starts one worker
+process per shard and polls the queue for progress. Each worker claims
+items from its own shard, runs the normal per-user onboarding (DB call,
+Cognito call, credential building) on a small thread pool and writes each
+resolved result back as soon as its user finishes, so a crash loses at most
+the users that were in flight. Because the queue is durable, items claimed by a
+worker that died are requeued and picked up again. Workers also publish their
+circuit breaker snapshots to the queue so the parent can show them live.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from circuit_breaker import breaker_snapshots, create_circuit_breakers, merge_breaker_snapshots
+from deploy_cache import KnownUsersCache, KnownUsersView
+from onboarding import onboard_user, resolve_user_outcome
+from wire_format import RequestEncoder
+
+DEPLOY_QUEUE_PATH = os.environ.get("DEPLOY_QUEUE_PATH", ".deploy_queue.db")
+
+# Seconds between breaker snapshots published by a worker while users are in flight
+BREAKER_REPORT_INTERVAL = 0.5
+
+
+def shard_for_email(email, num_shards):
+    """Stable shard index for an email address"""
+    digest = hashlib.md5(email.lower().encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little") % num_shards
+
+
+class WorkQueue:
+    """Durable SQLite work queue of per-user onboarding items
+
+    Each thread reuses one connection until close(), so workers that claim
+    and complete single users do not reopen (and checkpoint) the database
+    on every call.
+    """
+
+    def __init__(self, path=DEPLOY_QUEUE_PATH):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connect()
+        conn.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS work_items (
+                job_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                shard INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                payload TEXT NOT NULL,
+                result TEXT,
+                claimed_by TEXT,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, position)
+            );
+            CREATE INDEX IF NOT EXISTS idx_work_items_claim
+                ON work_items (job_id, shard, status);
+            CREATE TABLE IF NOT EXISTS worker_breakers (
+                job_id TEXT NOT NULL,
+                worker_id TEXT NOT NULL,
+                snapshots TEXT NOT NULL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (job_id, worker_id)
+            );
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=60)
+            # WAL commits survive a crashed worker without an fsync per commit
+            conn.execute("PRAGMA synchronous = NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def close(self):
+        """Close the calling thread's connection"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def enqueue(self, user_datas, num_shards):
+        """Add users as a new job, sharded by email hash; returns the job id"""
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "INSERT INTO work_items (job_id, position, shard, payload, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (job_id, position, shard_for_email(user_data["email"], num_shards), json.dumps(user_data), now)
+                    for position, user_data in enumerate(user_datas)
+                )
+            )
+        return job_id
+
+    def claim(self, job_id, shard, worker_id, batch_size=50):
+        """Atomically claim up to batch_size pending items of a shard"""
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute(
+                "SELECT position, payload FROM work_items "
+                "WHERE job_id = ? AND shard = ? AND status = 'pending' ORDER BY position LIMIT ?",
+                (job_id, shard, batch_size)
+            ).fetchall()
+            conn.executemany(
+                "UPDATE work_items SET status = 'claimed', claimed_by = ?, updated_at = ? "
+                "WHERE job_id = ? AND position = ?",
+                ((worker_id, time.time(), job_id, position) for position, _ in rows)
+            )
+        return [(position, json.loads(payload)) for position, payload in rows]
+
+    def complete(self, job_id, results):
+        """Store results for claimed items; results is a list of (position, result)"""
+        conn = self._connect()
+        with conn:
+            conn.executemany(
+                "UPDATE work_items SET status = 'done', result = ?, updated_at = ? "
+                "WHERE job_id = ? AND position = ?",
+                ((json.dumps(result), time.time(), job_id, position) for position, result in results)
+            )
+
+    def requeue_claimed(self, job_id):
+        """Return items claimed by workers that exited without finishing them"""
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "UPDATE work_items SET status = 'pending', claimed_by = NULL, updated_at = ? "
+                "WHERE job_id = ? AND status = 'claimed'",
+                (time.time(), job_id)
+            )
+            return cursor.rowcount
+
+    def progress(self, job_id):
+        """Count items per status for a job"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT status, COUNT(*) FROM work_items WHERE job_id = ? GROUP BY status",
+            (job_id,)
+        ).fetchall()
+        counts = {"pending": 0, "claimed": 0, "done": 0}
+        counts.update(dict(rows))
+        return counts
+
+    def results(self, job_id):
+        """Results of finished items in roster order as (position, result)"""
+        conn = self._connect()
+        rows = conn.execute(
+            "SELECT position, result FROM work_items WHERE job_id = ? AND status = 'done' ORDER BY position",
+            (job_id,)
+        ).fetchall()
+        return [(position, json.loads(result)) for position, result in rows]
+
+    def report_breakers(self, job_id, worker_id, snapshots):
+        """Store a worker's latest circuit breaker snapshots, keyed by flow stage"""
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO worker_breakers (job_id, worker_id, snapshots, updated_at) VALUES (?, ?, ?, ?)",
+                (job_id, worker_id, json.dumps(snapshots), time.time())
+            )
+
+    def breaker_snapshots(self, job_id):
+        """Breaker snapshots of all workers of a job merged per flow stage"""
+        conn = self._connect()
+        rows = conn.execute("SELECT snapshots FROM worker_breakers WHERE job_id = ?", (job_id,)).fetchall()
+        return merge_breaker_snapshots(json.loads(snapshots) for snapshots, in rows)
+
+    def delete_job(self, job_id):
+        """Remove all items and breaker snapshots of a finished job"""
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM work_items WHERE job_id = ?", (job_id,))
+            conn.execute("DELETE FROM worker_breakers WHERE job_id = ?", (job_id,))
+
+
+def worker_main(queue_path, job_id, shard, api_base_url, threads_per_worker=8, known_users_config=None,
+                breaker_config=None, encoder_config=None):
+    """Worker process entry point: drain one shard of a job
+
+    Up to threads_per_worker users are onboarded at once; a new item is only
+    claimed when a thread frees up, and finished users are written back
+    before anything else is claimed. known_users_config, if given, is a dict
+    with path, ttl_seconds and bypass used to open the known-users cache
+    inside this process. breaker_config, if given, has the circuit breaker
+    settings and max_queue_wait; the worker's breaker snapshots are then
+    published to the queue every BREAKER_REPORT_INTERVAL seconds while they
+    change. encoder_config, if given, has the RequestEncoder arguments.
+    """
+    known_users = None
+    if known_users_config:
+        known_users = KnownUsersView(
+            KnownUsersCache(known_users_config["path"]),
+            ttl_seconds=known_users_config["ttl_seconds"],
+            bypass=known_users_config["bypass"]
+        )
+
+    breakers = None
+    max_queue_wait = 600
+    if breaker_config:
+        breakers = create_circuit_breakers(**breaker_config["settings"])
+        max_queue_wait = breaker_config["max_queue_wait"]
+
+    encoder = RequestEncoder(**encoder_config) if encoder_config else None
+
+    def onboard(user_data):
+        outcome = onboard_user(
+            user_data, api_base_url, known_users=known_users,
+            breakers=breakers, max_queue_wait=max_queue_wait, encoder=encoder
+        )
+        resolved = resolve_user_outcome(user_data, outcome)
+        del resolved["notices"]
+        return resolved
+
+    queue = WorkQueue(queue_path)
+    worker_id = f"{multiprocessing.current_process().name}-{shard}"
+    reported = None
+
+    def report_breakers():
+        nonlocal reported
+        snapshots = breaker_snapshots(breakers)
+        if snapshots != reported:
+            queue.report_breakers(job_id, worker_id, snapshots)
+            reported = snapshots
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=threads_per_worker, thread_name_prefix=worker_id) as pool:
+        while True:
+            free_threads = threads_per_worker - len(in_flight)
+            if free_threads:
+                for position, user_data in queue.claim(job_id, shard, worker_id, free_threads):
+                    in_flight[pool.submit(onboard, user_data)] = position
+            if not in_flight:
+                break
+            done, _ = wait(
+                in_flight, timeout=BREAKER_REPORT_INTERVAL if breakers else None, return_when=FIRST_COMPLETED
+            )
+            if done:
+                queue.complete(job_id, [(in_flight.pop(future), future.result()) for future in done])
+            if breakers:
+                report_breakers()
+    if breakers:
+        report_breakers()
+    queue.close()
+
+
+def run_worker_pool(queue, job_id, num_workers, api_base_url, threads_per_worker=8, known_users_config=None,
+                    breaker_config=None, encoder_config=None, on_progress=None, poll_interval=0.25,
+                    max_rounds=3, on_breakers=None):
+    """Start one process per shard and wait until the job is drained
+
+    Each process onboards up to threads_per_worker users at a time. Items
+    left claimed by a crashed worker are requeued and another round of
+    workers is started, up to max_rounds. on_progress is called with the
+    queue counts and on_breakers with the workers' merged breaker snapshots
+    while waiting. Returns the final counts.
+    """
+    context = multiprocessing.get_context("spawn")
+    for _ in range(max_rounds):
+        processes = [
+            context.Process(
+                target=worker_main,
+                args=(
+                    queue.path, job_id, shard, api_base_url, threads_per_worker, known_users_config, breaker_config,
+                    encoder_config
+                ),
+                name=f"deploy-worker-{shard}",
+                daemon=True
+            )
+            for shard in range(num_workers)
+        ]
+        for process in processes:
+            process.start()
+        while any(process.is_alive() for process in processes):
+            if on_progress:
+                on_progress(queue.progress(job_id))
+            if on_breakers:
+                on_breakers(queue.breaker_snapshots(job_id))
+            time.sleep(poll_interval)
+        for process in processes:
+            process.join()
+
+        counts = queue.progress(job_id)
+        if counts["pending"] == 0 and counts["claimed"] == 0:
+            break
+        queue.requeue_claimed(job_id)
+
+    counts = queue.progress(job_id)
+    if on_progress:
+        on_progress(counts)
+    if on_breakers:
+        on_breakers(queue.breaker_snapshots(job_id))
+    return counts
@@ -0,0 +1,62 @@
+"""Exact apportionment and weighted bulk sampling for generated rosters
+
+Role counts are apportioned exactly with the largest-remainder (Hamilton)
+method, so a roster always has the nearest whole-number split of the
+requested percentages. Categorical fields are drawn for the whole roster at
+once from weight dicts; values missing from a weight dict get weight 1, so
+an empty dict means uniform.
+"""
+
+import numpy as np
+
+
+def largest_remainder(total, shares):
+    """Split total into whole counts proportional to shares
+
+    Every count gets the floor of its exact quota and the leftover units go
+    to the largest fractional remainders (earlier entries win ties).
+    """
+    shares = np.asarray(shares, dtype=float)
+    if total < 0 or (shares < 0).any() or shares.sum() <= 0:
+        raise ValueError("Apportionment needs a non-negative total and non-negative shares with a positive sum")
+    quotas = total * shares / shares.sum()
+    counts = np.floor(quotas).astype(np.int64)
+    leftover = total - int(counts.sum())
+    if leftover:
+        # Stable sort keeps the original order among equal remainders
+        order = np.argsort(-(quotas - counts), kind="stable")
+        counts[order[:leftover]] += 1
+    return counts
+
+
+def apportioned_column(total, values, shares):
+    """Column of total entries with each value repeated its apportioned count, in order"""
+    return np.repeat(np.array(values, dtype=object), largest_remainder(total, shares))
+
+
+def probabilities(values, weights=None):
+    """Normalized sampling probabilities for values from a {value: weight} dict"""
+    weights = weights or {}
+    p = np.array([float(weights.get(value, 1.0)) for value in values])
+    if (p < 0).any() or p.sum() <= 0:
+        raise ValueError(f"Weights for {', '.join(map(str, values))} must be non-negative with a positive sum")
+    return p / p.sum()
+
+
+def sample_column(rng, values, size, weights=None):
+    """Draw size values at once according to weights"""
+    return rng.choice(np.array(values, dtype=object), size=size, p=probabilities(values, weights))
+
+
+def sample_grouped_column(rng, groups, choices_by_group, weights=None):
+    """Draw one value per row from the choices of that row's group
+
+    groups is a column of group keys (e.g. org types) and choices_by_group
+    maps each key to its allowed values; each group is sampled in one call.
+    """
+    groups = np.asarray(groups, dtype=object)
+    column = np.empty(len(groups), dtype=object)
+    for group in dict.fromkeys(groups.tolist()):
+        mask = groups == group
+        column[mask] = sample_column(rng, choices_by_group[group], int(mask.sum()), weights)
+    return column
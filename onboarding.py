@@ -0,0 +1,495 @@
+"""Onboarding API calls: org steps and the per-user DB -> Cognito flow
+
+Nothing here touches Streamlit, so the same code runs on the app's thread,
+on worker threads, on an event loop and in worker processes.
+"""
+
+import asyncio
+import json
+import time
+from datetime import datetime
+
+import aiohttp
+import requests
+
+from circuit_breaker import circuit_open_response
+from tracing import NULL_TRACER
+
+
+def call_api_endpoint(url, data, method="POST", encoder=None):
+    """Helper function to call API endpoints
+
+    With an encoder, POST bodies are encoded by it and the response also
+    carries bytes_raw (plain JSON size) and bytes_sent (bytes on the wire).
+    """
+    wire = {}
+    try:
+        headers = {"Content-Type": "application/json"}
+
+        if method == "POST" and encoder:
+            for _ in range(2):
+                body, headers, raw_size = encoder.encode(url, data)
+                wire = {"bytes_raw": raw_size, "bytes_sent": wire.get("bytes_sent", 0) + len(body)}
+                response = requests.post(url, data=body, headers=headers, timeout=30)
+                if not encoder.observe(url, response.status_code, response.headers, headers):
+                    break
+        elif method == "POST":
+            response = requests.post(url, json=data, headers=headers, timeout=30)
+        else:
+            response = requests.get(url, params=data, timeout=30)
+
+        response.raise_for_status()
+        return {"success": True, "data": response.json(), **wire}
+    except requests.exceptions.RequestException as e:
+        status_code = e.response.status_code if e.response is not None else None
+        return {"success": False, "error": str(e), "status_code": status_code, **wire}
+
+
+def create_credentials_file(user_data, temp_password):
+    """Create a credentials file for download"""
+    credentials = {
+        "user_info": {
+            "first_name": user_data["first_name"],
+            "last_name": user_data["last_name"],
+            "email": user_data["email"],
+            "organization": user_data["org_name"],
+            "role": user_data["role_type"]
+        },
+        "login_credentials": {
+            "email": user_data["email"],
+            "temporary_password": temp_password,
+            "instructions": "Please change this password on first login"
+        },
+        "generated_at": datetime.now().isoformat(),
+        "note": "This password will only be shown once. Please save it securely."
+    }
+    return json.dumps(credentials, indent=2)
+
+
+def create_organization(org_name, api_base_url, deployment_cache=None, tracer=None):
+    """Create the organization via API, skipping the call if already cached
+
+    Returns (step, notice) where step is the deployment status entry and
+    notice is a (level, text) pair for display.
+    """
+    if deployment_cache is not None:
+        cached_org = deployment_cache.get_org(api_base_url, org_name)
+        if cached_org is not None:
+            org_id = cached_org["org_id"]
+            return (
+                {
+                    "step": "Organization Creation",
+                    "status": "Cached",
+                    "message": f"Organization ID: {org_id}" if org_id else "Organization already exists"
+                },
+                ("info", f"ℹ️ Organization '{org_name}' already created (cached), skipping")
+            )
+
+    org_data = {"org_name": org_name}
+    with (tracer or NULL_TRACER).span("org_creation", org_name=org_name):
+        org_response = call_api_endpoint(f"{api_base_url}/org/", org_data)
+
+    if org_response["success"]:
+        if org_response["data"]["status"] == 1:
+            org_id = org_response['data']['org_id']
+            if deployment_cache is not None:
+                deployment_cache.remember_org(api_base_url, org_name, org_id)
+            return (
+                {
+                    "step": "Organization Creation",
+                    "status": "Success",
+                    "message": f"Organization ID: {org_id}"
+                },
+                ("success", f"✅ Organization '{org_name}' created successfully (ID: {org_id})")
+            )
+        # Status 0 means the org is already there, so later runs can skip it too
+        if deployment_cache is not None:
+            deployment_cache.remember_org(api_base_url, org_name)
+        return (
+            {
+                "step": "Organization Creation",
+                "status": "Warning",
+                "message": "Status 0 - Organization may already exist"
+            },
+            ("warning", f"⚠️ Organization '{org_name}' creation returned status 0 (may already exist)")
+        )
+
+    return (
+        {
+            "step": "Organization Creation",
+            "status": "Failed",
+            "message": org_response['error']
+        },
+        ("error", f"❌ Failed to create organization: {org_response['error']}")
+    )
+
+
+def create_org_mappings(org_name, org_types, api_base_url, deployment_cache=None, tracer=None):
+    """Attach org types to the organization, only sending types not yet cached
+
+    Returns (step, notice) like create_organization.
+    """
+    pending_org_types = list(org_types)
+    if deployment_cache is not None:
+        mapped_org_types = deployment_cache.get_mapped_org_types(api_base_url, org_name)
+        pending_org_types = [org_type for org_type in org_types if org_type not in mapped_org_types]
+        if not pending_org_types:
+            return (
+                {
+                    "step": "Organization Mappings",
+                    "status": "Cached",
+                    "message": "Organization types already attached"
+                },
+                ("info", "ℹ️ Organization types already attached (cached), skipping")
+            )
+
+    mapping_data = {
+        "org_name": org_name,
+        "org_types": pending_org_types
+    }
+    with (tracer or NULL_TRACER).span("org_mappings", org_name=org_name):
+        mapping_response = call_api_endpoint(f"{api_base_url}/create-org-mappings/", mapping_data)
+
+    if mapping_response["success"]:
+        if deployment_cache is not None:
+            deployment_cache.remember_org_types(api_base_url, org_name, pending_org_types)
+        if len(mapping_response["data"]["orgmap_ids"]) >= 1:
+            message = "Organization types attached successfully"
+        else:
+            message = "Organization types already exist"
+        return (
+            {
+                "step": "Organization Mappings",
+                "status": "Success",
+                "message": message
+            },
+            ("success", f"✅ {message}")
+        )
+
+    return (
+        {
+            "step": "Organization Mappings",
+            "status": "Failed",
+            "message": mapping_response['error']
+        },
+        ("error", f"❌ Failed to create organization mappings: {mapping_response['error']}")
+    )
+
+
+def add_wire_bytes(outcome, response):
+    """Add a response's request body sizes to an onboarding outcome"""
+    outcome["bytes_raw"] += response.get("bytes_raw", 0)
+    outcome["bytes_sent"] += response.get("bytes_sent", 0)
+
+
+def onboard_user_flow(user_data, api_base_url, known_users=None, tracer=None):
+    """DB then Cognito onboarding steps for a single user, independent of the HTTP client
+
+    Generator that yields (stage, url, data) for each request it needs and is
+    sent back the call_api_endpoint-style response; its return value is the
+    outcome dict. Drive it with onboard_user (requests) or onboard_user_async
+    (asyncio) so both backends make the same decisions. If known_users is
+    given, steps for users already known to exist are skipped and successful
+    results are recorded for future runs.
+    """
+    tracer = tracer or NULL_TRACER
+    outcome = {"db_response": None, "cognito_response": None, "requests_skipped": 0, "bytes_raw": 0, "bytes_sent": 0}
+    email = user_data["email"]
+    known = None
+    if known_users:
+        with tracer.span("known_users_lookup", category="cache"):
+            known = known_users.lookup(api_base_url, email)
+
+    if known and known["in_db"]:
+        outcome["db_response"] = {
+            "success": True,
+            "data": {"status": 1, "message": "Already onboarded (cached)"},
+            "cached": True
+        }
+        outcome["requests_skipped"] += 1
+    else:
+        outcome["db_response"] = yield ("db", f"{api_base_url}/onboard-user/", user_data)
+        add_wire_bytes(outcome, outcome["db_response"])
+
+    # Cognito onboarding only if DB onboarding successful
+    db_response = outcome["db_response"]
+    if db_response["success"] and db_response["data"]["status"] == 1:
+        if known and known["in_cognito"]:
+            outcome["cognito_response"] = {
+                "success": True,
+                "data": {"status": "exists", "message": "User already exists (cached)"},
+                "cached": True
+            }
+            outcome["requests_skipped"] += 1
+        else:
+            cognito_data = {"email": email}
+            outcome["cognito_response"] = yield ("cognito", f"{api_base_url}/cognito/onboard", cognito_data)
+            add_wire_bytes(outcome, outcome["cognito_response"])
+
+    if known_users and not (known and known["in_db"] and known["in_cognito"]):
+        with tracer.span("known_users_record", category="cache"):
+            record_known_user(known_users, api_base_url, email, outcome)
+
+    return outcome
+
+
+def send_flow_request(request, breaker=None, on_stage=None, encoder=None, token=None, tracer=None):
+    """Send one (stage, url, data) flow request, recording the result on its breaker
+
+    token is what breaker.allow_request() returned for this request. Returns
+    None if the request was a half-open probe that failed: the breaker is
+    open again and the request should wait for it like any queued request
+    instead of failing its user. The HTTP call alone is traced as a
+    "<stage>_onboard" span.
+    """
+    stage, url, data = request
+    if on_stage:
+        on_stage(stage)
+    start = time.perf_counter()
+    with (tracer or NULL_TRACER).span(f"{stage}_onboard", email=data["email"]):
+        response = call_api_endpoint(url, data, encoder=encoder)
+    if breaker:
+        probe = breaker.record(response["success"], time.perf_counter() - start, token)
+        if probe and not response["success"]:
+            return None
+    return response
+
+
+def wait_for_breaker(breaker, max_wait_seconds):
+    """Block until the breaker allows a call and return its token; None if max_wait_seconds ran out"""
+    deadline = time.monotonic() + max_wait_seconds
+    token = breaker.allow_request()
+    if token is None:
+        with breaker.waiting():
+            while token is None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                time.sleep(min(max(breaker.retry_in(), 0.05), remaining, 1.0))
+                token = breaker.allow_request()
+    return token
+
+
+def onboard_user(user_data, api_base_url, on_stage=None, known_users=None, tracer=None,
+                 breakers=None, max_queue_wait=600, encoder=None):
+    """Run DB onboarding and then Cognito onboarding for a single user
+
+    Makes no UI calls so it can run from worker threads. on_stage, if given,
+    is called with "db" or "cognito" right before each request. With
+    breakers, a request to an endpoint whose breaker is open waits (up to
+    max_queue_wait seconds) for it to recover instead of being sent. encoder,
+    if given, is the RequestEncoder used for request bodies.
+    """
+    flow = onboard_user_flow(user_data, api_base_url, known_users, tracer)
+    try:
+        request = next(flow)
+        while True:
+            breaker = breakers.get(request[0]) if breakers else None
+            deadline = time.monotonic() + max_queue_wait
+            response = None
+            while response is None:  # A failed probe waits for the breaker again
+                token = wait_for_breaker(breaker, deadline - time.monotonic()) if breaker else None
+                if breaker and token is None:
+                    response = circuit_open_response(breaker)
+                else:
+                    response = send_flow_request(request, breaker, on_stage, encoder, token, tracer)
+            request = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def abandon_user_flow(flow, request, breakers):
+    """Finish a queued flow by failing its remaining requests without sending them"""
+    try:
+        while True:
+            request = flow.send(circuit_open_response(breakers[request[0]]))
+    except StopIteration as stop:
+        return stop.value
+
+
+def step_user_flow(flow, request, breakers=None, on_stage=None, encoder=None, tracer=None):
+    """Advance an onboarding flow without ever waiting on an open breaker
+
+    request is the flow's pending (stage, url, data), or None to start it.
+    Returns ("done", outcome) or ("blocked", request) when the next request's
+    endpoint breaker is open or the request was a failed half-open probe; a
+    blocked flow can be resumed later with the returned request.
+    """
+    try:
+        if request is None:
+            request = next(flow)
+        while True:
+            breaker = breakers.get(request[0]) if breakers else None
+            token = breaker.allow_request() if breaker else None
+            if breaker and token is None:
+                return "blocked", request
+            response = send_flow_request(request, breaker, on_stage, encoder, token, tracer)
+            if response is None:
+                return "blocked", request
+            request = flow.send(response)
+    except StopIteration as stop:
+        return "done", stop.value
+
+
+async def call_api_endpoint_async(session, url, data, encoder=None):
+    """Async counterpart of call_api_endpoint using a shared aiohttp.ClientSession"""
+    wire = {}
+    try:
+        timeout = aiohttp.ClientTimeout(total=30)
+        if not encoder:
+            headers = {"Content-Type": "application/json"}
+            async with session.post(url, json=data, headers=headers, timeout=timeout) as response:
+                response.raise_for_status()
+                return {"success": True, "data": await response.json(content_type=None)}
+
+        for attempt in range(2):
+            body, headers, raw_size = encoder.encode(url, data)
+            wire = {"bytes_raw": raw_size, "bytes_sent": wire.get("bytes_sent", 0) + len(body)}
+            async with session.post(url, data=body, headers=headers, timeout=timeout) as response:
+                if attempt == 0 and encoder.observe(url, response.status, response.headers, headers):
+                    continue
+                response.raise_for_status()
+                return {"success": True, "data": await response.json(content_type=None), **wire}
+    except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+        # Timeouts and some transport errors have an empty message
+        return {"success": False, "error": str(e) or type(e).__name__, "status_code": getattr(e, "status", None), **wire}
+
+
+async def onboard_user_async(session, user_data, api_base_url, known_users=None, tracer=None,
+                             breakers=None, max_queue_wait=600, encoder=None):
+    """Async counterpart of onboard_user driven by the same onboarding flow
+
+    Requests are traced as async spans keyed by the user's email, since the
+    users share the event loop thread.
+    """
+    tracer = tracer or NULL_TRACER
+    flow = onboard_user_flow(user_data, api_base_url, known_users, tracer)
+    try:
+        stage, url, data = next(flow)
+        while True:
+            breaker = breakers.get(stage) if breakers else None
+            deadline = time.monotonic() + max_queue_wait
+            response = None
+            while response is None:  # A failed probe waits for the breaker again
+                token = breaker.allow_request() if breaker else None
+                if breaker and token is None:
+                    with breaker.waiting():
+                        while token is None and time.monotonic() < deadline:
+                            await asyncio.sleep(min(max(breaker.retry_in(), 0.05), 1.0))
+                            token = breaker.allow_request()
+                if breaker and token is None:
+                    response = circuit_open_response(breaker)
+                    break
+                start = time.perf_counter()
+                with tracer.async_span(f"{stage}_onboard", user_data["email"]):
+                    response = await call_api_endpoint_async(session, url, data, encoder)
+                if breaker:
+                    probe = breaker.record(response["success"], time.perf_counter() - start, token)
+                    if probe and not response["success"]:
+                        response = None
+            stage, url, data = flow.send(response)
+    except StopIteration as stop:
+        return stop.value
+
+
+def record_known_user(known_users, api_base_url, email, outcome):
+    """Remember which systems a user is known to exist in after onboarding"""
+    db_response = outcome["db_response"]
+    cognito_response = outcome["cognito_response"]
+    in_db = db_response["success"] and db_response["data"]["status"] == 1
+    in_cognito = bool(
+        cognito_response
+        and cognito_response["success"]
+        and cognito_response["data"]["status"] in ("success", "exists")
+    )
+    if in_db or in_cognito:
+        known_users.remember(api_base_url, email, in_db=in_db, in_cognito=in_cognito)
+
+
+def resolve_user_outcome(user_data, outcome, tracer=None):
+    """Translate an onboard_user outcome into status updates and a result row
+
+    Returns a dict with:
+        employee_updates: fields to update on the employee record
+        result: the per-user deployment status entry
+        credential: credentials entry for new Cognito users (or None)
+        notices: list of (level, text) messages for display
+    """
+    full_name = f"{user_data['first_name']} {user_data['last_name']}"
+    user_response = outcome["db_response"]
+    cognito_response = outcome["cognito_response"]
+    resolved = {"employee_updates": {}, "result": None, "credential": None, "notices": []}
+
+    if user_response["success"] and user_response["data"]["status"] == 1:
+        if user_response.get("cached"):
+            resolved["notices"].append(("info", f"ℹ️ DB: {full_name} already onboarded (cached), skipped"))
+        else:
+            resolved["notices"].append(("success", f"✅ DB: {full_name} onboarded successfully"))
+        resolved["employee_updates"]["DB Status"] = "Deployed ✅"
+
+        if cognito_response["success"]:
+            cognito_status = cognito_response["data"]["status"]
+            cognito_message = cognito_response["data"]["message"]
+            temp_password = cognito_response["data"].get("temporary_password")
+
+            if cognito_status == "success":
+                resolved["notices"].append(("success", f"🔐 Cognito: {full_name} - New user created"))
+                resolved["employee_updates"]["Cognito Status"] = "New User ✅"
+                resolved["employee_updates"]["Temporary Password"] = temp_password
+
+                if temp_password:
+                    with (tracer or NULL_TRACER).span("build_credentials", category="credentials"):
+                        resolved["credential"] = {
+                            "name": full_name,
+                            "email": user_data["email"],
+                            "password": temp_password,
+                            "credentials_file": create_credentials_file(user_data, temp_password),
+                            "created_at": datetime.now().isoformat()
+                        }
+            elif cognito_status == "exists":
+                if cognito_response.get("cached"):
+                    resolved["notices"].append(("info", f"ℹ️ Cognito: {full_name} - User already exists (cached), skipped"))
+                else:
+                    resolved["notices"].append(("info", f"ℹ️ Cognito: {full_name} - User already exists"))
+                resolved["employee_updates"]["Cognito Status"] = "Exists ℹ️"
+            else:
+                resolved["notices"].append(("warning", f"⚠️ Cognito: {full_name} - {cognito_message}"))
+                resolved["employee_updates"]["Cognito Status"] = "Warning ⚠️"
+
+            resolved["result"] = {
+                "name": full_name,
+                "db_status": "Success",
+                "cognito_status": cognito_status,
+                "message": f"DB: {user_response['data']['message']}, Cognito: {cognito_message}"
+            }
+        else:
+            resolved["notices"].append(("error", f"❌ Cognito API error for {full_name}: {cognito_response['error']}"))
+            resolved["employee_updates"]["Cognito Status"] = "API Error ❌"
+            resolved["result"] = {
+                "name": full_name,
+                "db_status": "Success",
+                "cognito_status": "API Error",
+                "message": f"DB: {user_response['data']['message']}, Cognito: {cognito_response['error']}"
+            }
+    else:
+        # DB onboarding failed, Cognito was skipped
+        if user_response["success"]:
+            error_msg = user_response["data"].get('message', 'Unknown error')
+            resolved["notices"].append(("error", f"❌ DB: Failed to onboard {full_name}: {error_msg}"))
+        else:
+            error_msg = user_response['error']
+            resolved["notices"].append(("error", f"❌ DB: API error for {full_name}: {error_msg}"))
+
+        resolved["employee_updates"]["DB Status"] = "Failed ❌"
+        resolved["employee_updates"]["Cognito Status"] = "Skipped"
+        resolved["result"] = {
+            "name": full_name,
+            "db_status": "Failed",
+            "cognito_status": "Skipped",
+            "message": error_msg
+        }
+
+    resolved["result"]["requests_skipped"] = outcome.get("requests_skipped", 0)
+    resolved["result"]["bytes_raw"] = outcome.get("bytes_raw", 0)
+    resolved["result"]["bytes_sent"] = outcome.get("bytes_sent", 0)
+    return resolved
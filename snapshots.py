@@ -0,0 +1,233 @@
+"""Generated employee datasets saved as Arrow IPC snapshots
+
+A snapshot is an uncompressed Arrow IPC file with one column per employee
+record field (statuses included) and the API payload as a struct column.
+Repeated strings such as org type or status are dictionary-encoded.
+Temporary passwords are never written. Loading memory-maps the file, so
+opening a snapshot only reads its footer; employee dicts are built when rows
+are accessed, and counts/filters run on the Arrow columns.
+"""
+
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", "snapshots")
+SNAPSHOT_FORMAT = "employees-v1"
+SNAPSHOT_SUFFIX = ".arrow"
+
+# Record fields that are not persisted
+EXCLUDED_FIELDS = ("Temporary Password",)
+
+# Rows materialized per Arrow take when iterating a snapshot view
+ITER_CHUNK_SIZE = 4096
+
+
+def _column_array(values):
+    """Arrow array for one record field, dictionary-encoding repetitive strings"""
+    if values and all(isinstance(value, dict) for value in values):
+        names = list(values[0])
+        children = [_column_array([value.get(name) for value in values]) for name in names]
+        return pa.StructArray.from_arrays(children, names=names)
+    array = pa.array(values)
+    if pa.types.is_string(array.type) and pc.count_distinct(array).as_py() * 2 <= len(array):
+        array = array.dictionary_encode()
+    return array
+
+
+def employees_to_table(employees, org_name=None, org_types=None):
+    """Build a snapshot table from employee records"""
+    if isinstance(employees, SnapshotEmployees):
+        table = employees.unmodified_table()
+        if table is not None:
+            return table.replace_schema_metadata(_snapshot_metadata(table.num_rows, org_name, org_types))
+
+    records = list(employees)
+    if not records:
+        raise ValueError("No employees to snapshot")
+    fields = [field for field in records[0] if field not in EXCLUDED_FIELDS]
+    table = pa.Table.from_arrays(
+        [_column_array([record.get(field) for record in records]) for field in fields],
+        names=fields
+    )
+    return table.replace_schema_metadata(_snapshot_metadata(len(records), org_name, org_types))
+
+
+def _snapshot_metadata(rows, org_name, org_types):
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "org_name": org_name or "",
+        "org_types": json.dumps(list(org_types or [])),
+        "rows": str(rows),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S")
+    }
+
+
+def snapshot_path(name, directory=SNAPSHOT_DIR):
+    """File path for a snapshot name, keeping only filename-safe characters"""
+    safe_name = re.sub(r"[^A-Za-z0-9._-]+", "_", name.strip()).strip("._") or "snapshot"
+    return os.path.join(directory, safe_name + SNAPSHOT_SUFFIX)
+
+
+def save_snapshot(employees, name, org_name=None, org_types=None, directory=SNAPSHOT_DIR):
+    """Write employees to a snapshot file and return its path
+
+    org_name and org_types are the generation settings, stored so loading
+    the snapshot can restore them.
+    """
+    table = employees_to_table(employees, org_name, org_types)
+    os.makedirs(directory, exist_ok=True)
+    path = snapshot_path(name, directory)
+    tmp_path = path + ".tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table, max_chunksize=65536)
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_snapshot_info(path):
+    """Snapshot metadata (name, path, rows, org_name, org_types, created_at, size_mb) without loading rows
+
+    org_types is empty for snapshots saved without it.
+    """
+    with pa.memory_map(path) as source:
+        metadata = pa.ipc.open_file(source).schema.metadata or {}
+    metadata = {key.decode(): value.decode() for key, value in metadata.items()}
+    return {
+        "name": os.path.basename(path)[:-len(SNAPSHOT_SUFFIX)],
+        "path": path,
+        "rows": int(metadata.get("rows", 0)),
+        "org_name": metadata.get("org_name", ""),
+        "org_types": json.loads(metadata.get("org_types", "[]")),
+        "created_at": metadata.get("created_at", ""),
+        "size_mb": os.path.getsize(path) / (1024 * 1024)
+    }
+
+
+def list_snapshots(directory=SNAPSHOT_DIR):
+    """Info for every snapshot in directory, newest first"""
+    if not os.path.isdir(directory):
+        return []
+    paths = [
+        os.path.join(directory, filename) for filename in os.listdir(directory)
+        if filename.endswith(SNAPSHOT_SUFFIX)
+    ]
+    return [read_snapshot_info(path) for path in sorted(paths, key=os.path.getmtime, reverse=True)]
+
+
+def load_snapshot(path):
+    """Memory-map a snapshot; returns (SnapshotEmployees, info)"""
+    table = pa.ipc.open_file(pa.memory_map(path)).read_all()
+    if (table.schema.metadata or {}).get(b"format") != SNAPSHOT_FORMAT.encode():
+        raise ValueError(f"{path} is not an employee snapshot")
+    return SnapshotEmployees(table), read_snapshot_info(path)
+
+
+def delete_snapshot(path):
+    os.remove(path)
+
+
+class SnapshotEmployees:
+    """List-like view of employee records backed by a snapshot table
+
+    Rows become plain dicts on first access and are cached, so in-place
+    updates (deployment statuses, passwords) stick. Filtered views share the
+    base table and the row cache; value_counts and where read the Arrow
+    columns for rows that were never materialized.
+    """
+
+    def __init__(self, table, indices=None, rows=None):
+        self.table = table
+        self._indices = indices  # Base table row of each view position, or None for all rows
+        self._rows = {} if rows is None else rows
+
+    def __len__(self):
+        return self.table.num_rows if self._indices is None else len(self._indices)
+
+    def _base_indices(self):
+        return np.arange(self.table.num_rows) if self._indices is None else self._indices
+
+    def _materialize(self, base_indices):
+        missing = [int(base) for base in base_indices if int(base) not in self._rows]
+        if missing:
+            if missing == list(range(missing[0], missing[0] + len(missing))):
+                fetched = self.table.slice(missing[0], len(missing)).to_pylist()
+            else:
+                fetched = self.table.take(pa.array(missing)).to_pylist()
+            for base, row in zip(missing, fetched):
+                for field in EXCLUDED_FIELDS:
+                    row[field] = None
+                self._rows[base] = row
+        return [self._rows[int(base)] for base in base_indices]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._materialize(self._base_indices()[index])
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("snapshot index out of range")
+        base = index if self._indices is None else self._indices[index]
+        return self._materialize([base])[0]
+
+    def __iter__(self):
+        for start in range(0, len(self), ITER_CHUNK_SIZE):
+            yield from self[start:start + ITER_CHUNK_SIZE]
+
+    def _column(self, field, default=None):
+        column = self.table.column(field)
+        if self._indices is not None:
+            column = column.take(pa.array(self._indices))
+        if pa.types.is_dictionary(column.type):
+            column = column.cast(column.type.value_type)
+        if default is not None:
+            column = column.fill_null(default)
+        return column
+
+    def _cached_positions(self):
+        """View positions whose rows have been materialized"""
+        if not self._rows:
+            return np.array([], dtype=np.int64)
+        cached = np.fromiter(self._rows, dtype=np.int64, count=len(self._rows))
+        if self._indices is None:
+            return np.sort(cached)
+        return np.flatnonzero(np.isin(self._indices, cached))
+
+    def value_counts(self, field, default=None):
+        """Count rows per current value of a record field"""
+        column = self._column(field, default)
+        cached_positions = self._cached_positions()
+        if len(cached_positions):
+            keep = np.ones(len(self), dtype=bool)
+            keep[cached_positions] = False
+            column = column.filter(pa.array(keep))
+        counts = {}
+        for item in pc.value_counts(column).to_pylist():
+            counts[item["values"]] = counts.get(item["values"], 0) + item["counts"]
+        base_indices = self._base_indices()
+        for position in cached_positions:
+            value = self._rows[int(base_indices[position])].get(field, default)
+            counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def where(self, field, value, default=None):
+        """Filtered view of the rows whose current value of field equals value"""
+        matches = pc.equal(self._column(field, default), value).fill_null(False).to_numpy(zero_copy_only=False)
+        base_indices = self._base_indices()
+        for position in self._cached_positions():
+            matches[position] = self._rows[int(base_indices[position])].get(field, default) == value
+        return SnapshotEmployees(self.table, base_indices[matches], self._rows)
+
+    def unmodified_table(self):
+        """The view's rows as a table if none were materialized, else None"""
+        if len(self._cached_positions()):
+            return None
+        if self._indices is None:
+            return self.table
+        return self.table.take(pa.array(self._indices))
@@ -0,0 +1,188 @@
+"""Local stub of the onboarding API for load tests and offline deployments
+
+Implements the same request/response shapes the app expects from the real
+backend:
+
+    POST /org/                   -> {"status": 1, "org_id": ...}
+    POST /create-org-mappings/   -> {"orgmap_ids": [...]}
+    POST /onboard-user/          -> {"status": 1, "message": ...}
+    POST /cognito/onboard        -> {"status": "success" | "exists", ...}
+
+It also serves the bulk endpoints (/onboard-users/bulk, /cognito/onboard/bulk)
+that take a compact batch and return {"results": [...]}, accepts gzip/zstd
+request bodies and advertises them via the Accept-Encoding response header.
+
+Run it with:
+
+    python stub_server.py --port 8765 --latency-ms 20 --error-rate 0.01
+"""
+
+import argparse
+import json
+import random
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wire_format import SUPPORTED_ENCODINGS, decode_compact_batch, decompress
+
+# Bulk endpoints and the single-user endpoint each record is handled by
+BULK_ENDPOINTS = {
+    "/onboard-users/bulk": "/onboard-user/",
+    "/cognito/onboard/bulk": "/cognito/onboard"
+}
+
+
+class StubState:
+    """In-memory backend state shared by all request handler threads"""
+
+    def __init__(self, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.orgs = {}
+        self.org_mappings = {}
+        self.db_users = set()
+        self.cognito_users = set()
+        self.request_counts = {}
+        self.bytes_received = 0
+        self._lock = threading.Lock()
+
+    def handle(self, path, body):
+        """Return (http_status, response_dict) for a request"""
+        if path in BULK_ENDPOINTS:
+            try:
+                records = decode_compact_batch(body)
+            except (KeyError, TypeError, ValueError) as e:
+                return 400, {"detail": f"Invalid batch: {e}"}
+            with self._lock:
+                self.request_counts[path] = self.request_counts.get(path, 0) + 1
+            return 200, {"results": [self.handle(BULK_ENDPOINTS[path], record)[1] for record in records]}
+
+        with self._lock:
+            self.request_counts[path] = self.request_counts.get(path, 0) + 1
+
+            if path == "/org/":
+                org_name = body.get("org_name")
+                if org_name in self.orgs:
+                    return 200, {"status": 0, "message": "Organization already exists"}
+                self.orgs[org_name] = len(self.orgs) + 1
+                return 200, {"status": 1, "org_id": self.orgs[org_name]}
+
+            if path == "/create-org-mappings/":
+                mapped = self.org_mappings.setdefault(body.get("org_name"), set())
+                new_types = [org_type for org_type in body.get("org_types", []) if org_type not in mapped]
+                mapped.update(new_types)
+                return 200, {"orgmap_ids": list(range(1, len(new_types) + 1))}
+
+            if path == "/onboard-user/":
+                self.db_users.add(body.get("email"))
+                return 200, {"status": 1, "message": "User onboarded"}
+
+            if path == "/cognito/onboard":
+                email = body.get("email")
+                if email in self.cognito_users:
+                    return 200, {"status": "exists", "message": "User already exists"}
+                self.cognito_users.add(email)
+                return 200, {
+                    "status": "success",
+                    "message": "User created",
+                    "temporary_password": secrets.token_urlsafe(9)
+                }
+
+        return 404, {"detail": "Not Found"}
+
+
+class StubHTTPServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 drops connections under load tests
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def make_handler(state):
+    """Build a request handler class bound to the given state"""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; avoid Nagle stalls on keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send_json(self, status, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            # Request content codings this server accepts (RFC 7694)
+            self.send_header("Accept-Encoding", ", ".join(SUPPORTED_ENCODINGS))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            raw_body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            with state._lock:
+                state.bytes_received += len(raw_body)
+            try:
+                raw_body = decompress(raw_body, self.headers.get("Content-Encoding"))
+            except ValueError:
+                self._send_json(415, {"detail": "Unsupported Content-Encoding"})
+                return
+            except OSError:
+                self._send_json(400, {"detail": "Corrupt compressed body"})
+                return
+            try:
+                body = json.loads(raw_body or b"{}")
+            except ValueError:
+                self._send_json(400, {"detail": "Invalid JSON"})
+                return
+
+            delay_ms = state.latency_ms + random.uniform(0, state.jitter_ms)
+            if delay_ms > 0:
+                time.sleep(delay_ms / 1000)
+
+            if state.error_rate and random.random() < state.error_rate:
+                self._send_json(500, {"detail": "Injected stub error"})
+                return
+
+            status, payload = state.handle(self.path, body)
+            self._send_json(status, payload)
+
+    return StubHandler
+
+
+def start_stub_server(host="127.0.0.1", port=0, latency_ms=0.0, jitter_ms=0.0, error_rate=0.0):
+    """Start the stub server on a background thread
+
+    Returns the server; its base URL is http://host:server.server_port and
+    its StubState is available as server.state. Call server.shutdown() to stop.
+    """
+    state = StubState(latency_ms, jitter_ms, error_rate)
+    server = StubHTTPServer((host, port), make_handler(state))
+    server.state = state
+    threading.Thread(target=server.serve_forever, name="stub-server", daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stub of the onboarding API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Fixed delay added to every request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Random extra delay up to this value")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with HTTP 500")
+    args = parser.parse_args()
+
+    server = start_stub_server(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate)
+    print(f"Stub API listening on http://{args.host}:{server.server_port}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
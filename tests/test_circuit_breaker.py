@@ -0,0 +1,219 @@
+import pytest
+
+import circuit_breaker
+import onboarding
+from circuit_breaker import CircuitBreaker, create_circuit_breakers, describe_breaker, merge_breaker_snapshots
+from onboarding import onboard_user, onboard_user_flow, step_user_flow
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", clock)
+    return clock
+
+
+def open_breaker(breaker):
+    for _ in range(breaker.min_calls):
+        breaker.record(False, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def make_breaker(**settings):
+    settings = {"window": 4, "min_calls": 4, "failure_rate_threshold": 0.5, "cooldown_seconds": 30.0, **settings}
+    return CircuitBreaker("/onboard-user/", **settings)
+
+
+def test_opens_once_failure_rate_reached(clock):
+    breaker = make_breaker()
+    for success in (True, True, False):
+        breaker.record(success, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    breaker.record(False, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 1
+    assert breaker.allow_request() is None
+    assert breaker.retry_in() == pytest.approx(30.0)
+
+
+def test_slow_calls_count_as_failures(clock):
+    breaker = make_breaker(slow_call_seconds=1.0)
+    for _ in range(4):
+        breaker.record(True, 2.0, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_half_open_lets_a_single_probe_through(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+
+    clock.now += 30.0
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    probe = breaker.allow_request()
+    assert probe is not None
+    assert breaker.allow_request() is None
+
+
+def test_probe_success_closes(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.now += 30.0
+
+    breaker.record(True, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow_request() is not None
+
+
+def test_probe_failure_reopens(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.now += 30.0
+
+    assert breaker.record(False, 0.1, breaker.allow_request()) is True
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.times_opened == 2
+    assert breaker.retry_in() == pytest.approx(30.0)
+
+
+def test_stale_result_does_not_decide_half_open(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False, 0.1, breaker.allow_request())
+    straggler = breaker.allow_request()  # Admitted while closed, finishes much later
+    breaker.record(False, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    clock.now += 30.0
+    probe = breaker.allow_request()
+    breaker.record(True, 0.1, straggler)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    assert breaker.allow_request() is None  # Probe is still in flight
+
+    breaker.record(False, 0.1, probe)
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_stale_failures_stay_out_of_the_new_window(clock):
+    breaker = make_breaker()
+    stragglers = [breaker.allow_request() for _ in range(4)]
+    open_breaker(breaker)
+    clock.now += 30.0
+    breaker.record(True, 0.1, breaker.allow_request())
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    for token in stragglers:
+        breaker.record(False, 0.1, token)
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.times_opened == 1
+
+
+def test_snapshot_counts_queued_callers(clock):
+    breaker = make_breaker()
+    open_breaker(breaker)
+    clock.now += 10.0
+
+    with breaker.waiting(), breaker.waiting():
+        snapshot = breaker.snapshot()
+    assert snapshot == {
+        "name": "/onboard-user/", "state": CircuitBreaker.OPEN, "times_opened": 1, "queued": 2, "retry_in": 20.0
+    }
+    assert describe_breaker(snapshot) == "🔴 /onboard-user/: open (retry in 20s, 2 queued)"
+    assert breaker.snapshot()["queued"] == 0
+
+
+def test_merge_keeps_the_least_healthy_state():
+    closed = {"name": "/onboard-user/", "state": "closed", "times_opened": 1, "queued": 0, "retry_in": 0.0}
+    opened = {"name": "/onboard-user/", "state": "open", "times_opened": 2, "queued": 3, "retry_in": 12.0}
+    half_open = {"name": "/cognito/onboard", "state": "half-open", "times_opened": 1, "queued": 1, "retry_in": 0.0}
+
+    merged = merge_breaker_snapshots([{"db": closed}, {"db": opened, "cognito": half_open}, {"db": closed}])
+
+    assert merged["db"] == {"name": "/onboard-user/", "state": "open", "times_opened": 4, "queued": 3, "retry_in": 12.0}
+    assert merged["cognito"] == half_open
+    assert closed["times_opened"] == 1  # Inputs are left alone
+
+
+USER = {"first_name": "Ada", "last_name": "Lovelace", "email": "ada@example.com", "org_name": "Sunrise",
+        "role_type": "staff"}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    """Scripted call_api_endpoint: pops one success flag per request"""
+    script = []
+
+    def call_api_endpoint(url, data, encoder=None):
+        if not script.pop(0):
+            return {"success": False, "error": "503 Server Error", "status_code": 503}
+        if url.endswith("/cognito/onboard"):
+            return {"success": True, "data": {"status": "exists", "message": "User already exists"}}
+        return {"success": True, "data": {"status": 1, "message": "User onboarded"}}
+
+    monkeypatch.setattr(onboarding, "call_api_endpoint", call_api_endpoint)
+    return script
+
+
+def half_open_breakers():
+    breakers = create_circuit_breakers(window=4, min_calls=4, cooldown_seconds=30.0)
+    open_breaker(breakers["db"])
+    return breakers
+
+
+def test_record_reports_only_the_probe(clock):
+    breaker = make_breaker()
+    assert breaker.record(False, 0.1, breaker.allow_request()) is False
+    straggler = breaker.allow_request()
+    open_breaker(breaker)
+    clock.now += 30.0
+
+    probe = breaker.allow_request()
+    assert breaker.record(False, 0.1, straggler) is False
+    assert breaker.record(True, 0.1, probe) is True
+
+
+def test_failed_probe_requeues_a_stepped_user(clock, api):
+    breakers = half_open_breakers()
+    flow = onboard_user_flow(USER, "http://api")
+
+    state, request = step_user_flow(flow, None, breakers)
+    assert state == "blocked"
+    clock.now += 30.0
+    api.extend([False])
+    state, request = step_user_flow(flow, request, breakers)
+    assert (state, request[0]) == ("blocked", "db")  # Failed probe: queued again, not failed
+    assert breakers["db"].state == CircuitBreaker.OPEN
+
+    clock.now += 30.0
+    api.extend([True, True])
+    state, outcome = step_user_flow(flow, request, breakers)
+    assert state == "done"
+    assert outcome["db_response"]["success"]
+    assert outcome["cognito_response"]["data"]["status"] == "exists"
+
+
+def test_failed_probe_makes_a_waiting_user_wait_again(clock, api, monkeypatch):
+    breakers = half_open_breakers()
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock.now += seconds
+
+    monkeypatch.setattr(onboarding.time, "sleep", sleep)
+    api.extend([False, True, True])
+    outcome = onboard_user(USER, "http://api", breakers=breakers, max_queue_wait=600)
+
+    assert outcome["db_response"]["success"]
+    assert outcome["cognito_response"]["success"]
+    assert breakers["db"].times_opened == 2
+    assert breakers["db"].state == CircuitBreaker.CLOSED
+    assert sum(sleeps) == pytest.approx(60.0)
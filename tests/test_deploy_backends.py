@@ -0,0 +1,59 @@
+import copy
+
+import pytest
+
+from deploy_backends import deploy_org_with_backend, summarize_user_results
+from stub_server import start_stub_server
+
+
+def make_org(count):
+    employees = []
+    for k in range(count):
+        email = f"user{k}@example.com"
+        api_data = {
+            "first_name": "User",
+            "last_name": str(k),
+            "email": email,
+            "org_name": "Sunrise",
+            "org_types": ["ALF/SHE", "SLF"],
+            "role_type": ("staff", "instructor", "facility_admin")[k % 3]
+        }
+        employees.append({
+            "Name": f"User {k}",
+            "Email": email,
+            "DB Status": "Generated",
+            "Cognito Status": "Pending",
+            "Temporary Password": None,
+            "api_data": api_data
+        })
+    return {"org_name": "Sunrise", "org_types": ["ALF/SHE", "SLF"], "employees": employees}
+
+
+def deploy(org_config, backend, existing_cognito_users=()):
+    """Deploy a copy of org_config against a fresh stub server"""
+    server = start_stub_server()
+    server.state.cognito_users.update(existing_cognito_users)
+    org_config = copy.deepcopy(org_config)
+    try:
+        org_result = deploy_org_with_backend(org_config, f"http://127.0.0.1:{server.server_port}", backend, 4)
+    finally:
+        server.shutdown()
+    return org_result, org_config["employees"]
+
+
+def without_passwords(employees):
+    return [{**employee, "Temporary Password": bool(employee["Temporary Password"])} for employee in employees]
+
+
+@pytest.mark.parametrize("existing", [(), ("user1@example.com", "user4@example.com")])
+def test_async_backend_matches_threaded(existing):
+    org_config = make_org(9)
+
+    threaded_result, threaded_employees = deploy(org_config, "threaded", existing)
+    async_result, async_employees = deploy(org_config, "async", existing)
+
+    assert summarize_user_results(async_result["user_results"]) == summarize_user_results(threaded_result["user_results"])
+    assert async_result["user_results"] == threaded_result["user_results"]
+    assert async_result["deployment_status"][:2] == threaded_result["deployment_status"][:2]
+    assert without_passwords(async_employees) == without_passwords(threaded_employees)
+    assert len(async_result["credentials"]) == len(threaded_result["credentials"]) == 9 - len(existing)
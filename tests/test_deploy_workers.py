@@ -0,0 +1,158 @@
+import pytest
+
+from deploy_workers import WorkQueue, run_worker_pool, shard_for_email, worker_main
+from stub_server import start_stub_server
+
+
+def make_users(count):
+    return [
+        {
+            "first_name": "User",
+            "last_name": str(k),
+            "email": f"user{k}@example.com",
+            "org_name": "Sunrise",
+            "org_types": ["SLF"],
+            "role_type": "staff"
+        }
+        for k in range(count)
+    ]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = WorkQueue(str(tmp_path / "queue.db"))
+    yield queue
+    queue.close()
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server()
+    yield server
+    server.shutdown()
+
+
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def test_shard_for_email_is_stable_and_case_insensitive():
+    shards = [shard_for_email(f"user{k}@example.com", 4) for k in range(200)]
+
+    assert shards == [shard_for_email(f"user{k}@example.com", 4) for k in range(200)]
+    assert shard_for_email("User0@Example.com", 4) == shards[0]
+    assert set(shards) == {0, 1, 2, 3}
+
+
+def test_enqueue_uses_email_shards(queue):
+    users = make_users(20)
+    job_id = queue.enqueue(users, 3)
+
+    for shard in range(3):
+        claimed = queue.claim(job_id, shard, "worker", batch_size=100)
+        assert [user["email"] for _, user in claimed] == [
+            user["email"] for user in users if shard_for_email(user["email"], 3) == shard
+        ]
+
+
+def test_claim_complete_round_trip(queue):
+    job_id = queue.enqueue(make_users(5), 1)
+
+    claimed = queue.claim(job_id, 0, "worker", batch_size=3)
+    assert [position for position, _ in claimed] == [0, 1, 2]
+    assert queue.progress(job_id) == {"pending": 2, "claimed": 3, "done": 0}
+
+    queue.complete(job_id, [(position, {"email": user["email"]}) for position, user in claimed])
+    assert queue.progress(job_id) == {"pending": 2, "claimed": 0, "done": 3}
+    assert [position for position, _ in queue.claim(job_id, 0, "worker", batch_size=10)] == [3, 4]
+
+
+def test_requeue_claimed_returns_unfinished_items(queue):
+    job_id = queue.enqueue(make_users(4), 1)
+    claimed = queue.claim(job_id, 0, "crashed", batch_size=4)
+    queue.complete(job_id, [(claimed[0][0], {"ok": True})])
+
+    assert queue.requeue_claimed(job_id) == 3
+    assert queue.progress(job_id) == {"pending": 3, "claimed": 0, "done": 1}
+    assert [position for position, _ in queue.claim(job_id, 0, "retry", batch_size=10)] == [1, 2, 3]
+
+
+def test_results_are_in_roster_order(queue):
+    job_id = queue.enqueue(make_users(6), 1)
+    claimed = queue.claim(job_id, 0, "worker", batch_size=6)
+
+    # Complete out of order, the way a thread pool finishes users
+    for position, _ in reversed(claimed):
+        queue.complete(job_id, [(position, {"position": position})])
+
+    assert queue.results(job_id) == [(k, {"position": k}) for k in range(6)]
+
+
+def test_breaker_snapshots_merge_across_workers(queue):
+    job_id = queue.enqueue(make_users(2), 2)
+    snapshot = {"name": "/onboard-user/", "state": "closed", "times_opened": 0, "queued": 0, "retry_in": 0.0}
+    queue.report_breakers(job_id, "worker-0", {"db": {**snapshot, "state": "open", "times_opened": 1, "queued": 4}})
+    queue.report_breakers(job_id, "worker-1", {"db": snapshot})
+    queue.report_breakers(job_id, "worker-1", {"db": {**snapshot, "times_opened": 2}})
+
+    merged = queue.breaker_snapshots(job_id)["db"]
+    assert (merged["state"], merged["times_opened"], merged["queued"]) == ("open", 3, 4)
+
+    queue.delete_job(job_id)
+    assert queue.breaker_snapshots(job_id) == {}
+
+
+def test_delete_job_leaves_other_jobs(queue):
+    first = queue.enqueue(make_users(2), 1)
+    second = queue.enqueue(make_users(3), 1)
+
+    queue.delete_job(first)
+
+    assert queue.progress(first) == {"pending": 0, "claimed": 0, "done": 0}
+    assert queue.progress(second)["pending"] == 3
+
+
+def test_worker_finishes_items_of_a_crashed_worker(queue, stub):
+    users = make_users(8)
+    job_id = queue.enqueue(users, 1)
+    queue.claim(job_id, 0, "crashed", batch_size=5)
+
+    assert queue.requeue_claimed(job_id) == 5
+    worker_main(queue.path, job_id, 0, base_url(stub), threads_per_worker=4)
+
+    results = queue.results(job_id)
+    assert [position for position, _ in results] == list(range(8))
+    assert all(result["employee_updates"]["DB Status"] == "Deployed ✅" for _, result in results)
+    assert all(result["employee_updates"]["Cognito Status"] == "New User ✅" for _, result in results)
+    assert stub.state.db_users == {user["email"] for user in users}
+
+
+def test_worker_reports_breaker_trips(queue):
+    failing = start_stub_server(error_rate=1.0)
+    job_id = queue.enqueue(make_users(4), 1)
+    breaker_config = {"settings": {"min_calls": 2, "window": 4}, "max_queue_wait": 0}
+    try:
+        worker_main(queue.path, job_id, 0, base_url(failing), threads_per_worker=1, breaker_config=breaker_config)
+    finally:
+        failing.shutdown()
+
+    snapshots = queue.breaker_snapshots(job_id)
+    assert (snapshots["db"]["name"], snapshots["db"]["state"], snapshots["db"]["times_opened"]) == (
+        "/onboard-user/", "open", 1
+    )
+    assert snapshots["db"]["queued"] == 0
+    assert snapshots["cognito"]["times_opened"] == 0
+
+
+def test_worker_pool_requeues_items_left_claimed(queue, stub):
+    users = make_users(6)
+    job_id = queue.enqueue(users, 2)
+    # A worker from an earlier round died holding these items
+    stranded = queue.claim(job_id, 0, "crashed", batch_size=2)
+    assert len(stranded) == 2
+
+    counts = run_worker_pool(queue, job_id, 2, base_url(stub), threads_per_worker=2, poll_interval=0.05)
+
+    assert counts == {"pending": 0, "claimed": 0, "done": 6}
+    assert [position for position, _ in queue.results(job_id)] == list(range(6))
+    assert {user["email"] for _, user in stranded} <= stub.state.cognito_users
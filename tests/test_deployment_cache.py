@@ -0,0 +1,92 @@
+import pytest
+
+import onboarding
+from deploy_cache import DeploymentCache
+from onboarding import create_org_mappings, create_organization
+from stub_server import start_stub_server
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def api_base_url(stub):
+    return f"http://127.0.0.1:{stub.server_port}"
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return DeploymentCache(str(tmp_path / "cache.db"))
+
+
+@pytest.fixture
+def sent(monkeypatch):
+    """Bodies of the API calls actually made, by URL path"""
+    calls = []
+    call_api_endpoint = onboarding.call_api_endpoint
+
+    def spy(url, data, *args, **kwargs):
+        calls.append((url.split("/", 3)[3], data))
+        return call_api_endpoint(url, data, *args, **kwargs)
+
+    monkeypatch.setattr(onboarding, "call_api_endpoint", spy)
+    return calls
+
+
+def test_create_organization_is_skipped_once_cached(api_base_url, cache, sent):
+    step, _ = create_organization("Sunrise", api_base_url, cache)
+    assert step["status"] == "Success"
+
+    step, notice = create_organization("Sunrise", api_base_url, cache)
+    assert step == {"step": "Organization Creation", "status": "Cached", "message": "Organization ID: 1"}
+    assert notice[0] == "info"
+    assert sent == [("org/", {"org_name": "Sunrise"})]
+
+
+def test_existing_organization_is_cached_too(api_base_url, cache, sent):
+    create_organization("Sunrise", api_base_url)  # Created before the cache knew about it
+
+    assert create_organization("Sunrise", api_base_url, cache)[0]["status"] == "Warning"
+    assert create_organization("Sunrise", api_base_url, cache)[0] == {
+        "step": "Organization Creation", "status": "Cached", "message": "Organization already exists"
+    }
+    assert len(sent) == 2
+
+
+def test_cache_is_per_api_base_url(api_base_url, cache, sent):
+    cache.remember_org("http://other", "Sunrise", 7)
+    cache.remember_org_types("http://other", "Sunrise", ["SLF"])
+
+    assert create_organization("Sunrise", api_base_url, cache)[0]["status"] == "Success"
+    assert create_org_mappings("Sunrise", ["SLF"], api_base_url, cache)[0]["status"] == "Success"
+    assert [path for path, _ in sent] == ["org/", "create-org-mappings/"]
+
+
+def test_create_org_mappings_sends_only_unmapped_types(api_base_url, cache, sent):
+    assert create_org_mappings("Sunrise", ["ALF/SHE"], api_base_url, cache)[0]["status"] == "Success"
+    assert create_org_mappings("Sunrise", ["ALF/SHE", "SLF"], api_base_url, cache)[0]["status"] == "Success"
+    step, _ = create_org_mappings("Sunrise", ["SLF", "ALF/SHE"], api_base_url, cache)
+
+    assert step == {"step": "Organization Mappings", "status": "Cached", "message": "Organization types already attached"}
+    assert sent == [
+        ("create-org-mappings/", {"org_name": "Sunrise", "org_types": ["ALF/SHE"]}),
+        ("create-org-mappings/", {"org_name": "Sunrise", "org_types": ["SLF"]})
+    ]
+    assert cache.stats() == {"orgs": 0, "org_mappings": 2}
+
+
+def test_failed_calls_are_not_cached(cache):
+    failing = start_stub_server(error_rate=1.0)
+    api_base_url = f"http://127.0.0.1:{failing.server_port}"
+    try:
+        assert create_organization("Sunrise", api_base_url, cache)[0]["status"] == "Failed"
+        assert create_org_mappings("Sunrise", ["SLF"], api_base_url, cache)[0]["status"] == "Failed"
+    finally:
+        failing.shutdown()
+
+    assert cache.get_org(api_base_url, "Sunrise") is None
+    assert cache.get_mapped_org_types(api_base_url, "Sunrise") == set()
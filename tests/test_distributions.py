@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+from app import field_weight_errors, org_roles, qualifications, sample_user_fields
+from distributions import (
+    apportioned_column, largest_remainder, probabilities, sample_column, sample_grouped_column
+)
+
+
+@pytest.mark.parametrize("total, shares, expected", [
+    (10, [0.5, 0.4, 0.1], [5, 4, 1]),
+    (7, [0.5, 0.4, 0.1], [3, 3, 1]),
+    (3, [1, 1, 1], [1, 1, 1]),
+    (2, [1, 1, 1], [1, 1, 0]),  # Ties go to earlier entries
+    (1, [0.3, 0.7], [0, 1]),
+    (0, [0.5, 0.5], [0, 0]),
+    (5, [0, 1], [0, 5]),
+])
+def test_largest_remainder(total, shares, expected):
+    assert largest_remainder(total, shares).tolist() == expected
+
+
+@pytest.mark.parametrize("total", [1, 9, 10, 11, 99, 1000003])
+def test_largest_remainder_sums_to_total_and_stays_within_one_of_quota(total):
+    shares = np.array([0.5, 0.4, 0.1])
+    counts = largest_remainder(total, shares)
+    assert counts.sum() == total
+    assert (np.abs(counts - total * shares) < 1).all()
+
+
+@pytest.mark.parametrize("total, shares", [(-1, [1]), (5, [0, 0]), (5, [1, -1]), (5, [])])
+def test_largest_remainder_rejects_bad_input(total, shares):
+    with pytest.raises(ValueError):
+        largest_remainder(total, shares)
+
+
+def test_apportioned_column():
+    column = apportioned_column(10, ["staff", "instructor", "facility_admin"], [0.5, 0.4, 0.1])
+    assert column.tolist() == ["staff"] * 5 + ["instructor"] * 4 + ["facility_admin"]
+
+
+def test_probabilities_default_missing_values_to_one():
+    assert probabilities(["a", "b", "c"], {"a": 2}).tolist() == [0.5, 0.25, 0.25]
+    assert probabilities(["a", "b"]).tolist() == [0.5, 0.5]
+    with pytest.raises(ValueError):
+        probabilities(["a", "b"], {"a": 0, "b": 0})
+
+
+def test_sample_column_skips_zero_weights():
+    rng = np.random.default_rng(0)
+    column = sample_column(rng, ["a", "b", "c"], 1000, {"b": 0})
+    assert len(column) == 1000
+    assert set(column.tolist()) == {"a", "c"}
+
+
+def test_sample_grouped_column_draws_from_each_rows_group():
+    rng = np.random.default_rng(0)
+    groups = ["x", "y"] * 50
+    column = sample_grouped_column(rng, groups, {"x": ["x1", "x2"], "y": ["y1"]})
+    assert all(value.startswith(group) for group, value in zip(groups, column.tolist()))
+
+
+def test_sample_user_fields_follow_weights():
+    org_types = ["ALF/SHE", "SLF"]
+    fields = sample_user_fields(
+        500, org_types, {"org_type": {"SLF": 0}, "qualification": {q: 0 for q in qualifications[1:]}},
+        rng=np.random.default_rng(0)
+    )
+    assert len(fields) == 500
+    assert {row["org_type"] for row in fields} == {"ALF/SHE"}
+    assert {row["qualification"] for row in fields} == {qualifications[0]}
+    assert all(row["prof_type"] in org_roles["ALF/SHE"] for row in fields)
+
+
+def test_field_weight_errors():
+    org_types = ["ALF/SHE", "SLF"]
+    assert field_weight_errors(org_types) == []
+    assert field_weight_errors(org_types, {"org_type": {"ALF/SHE": 0}}) == []
+
+    errors = field_weight_errors(org_types, {"org_type": {"ALF/SHE": 0, "SLF": 0}})
+    assert len(errors) == 1 and errors[0].startswith("Org Type")
+
+    errors = field_weight_errors(org_types, {"qualification": {q: 0 for q in qualifications}})
+    assert len(errors) == 1 and errors[0].startswith("Qualification")
+
+
+def test_field_weight_errors_check_professional_types_per_drawable_org_type():
+    slf_roles_off = {"prof_type": {role: 0 for role in org_roles["SLF"]}}
+    errors = field_weight_errors(["ALF/SHE", "SLF"], slf_roles_off)
+    assert errors == [error for error in errors if "(SLF)" in error] and errors
+
+    # SLF can't be drawn, so its roles don't matter
+    assert field_weight_errors(["ALF/SHE", "SLF"], {**slf_roles_off, "org_type": {"SLF": 0}}) == []
+
+
+def test_weights_that_pass_validation_can_be_sampled():
+    org_types = list(org_roles)
+    weights = {"org_type": {org_types[0]: 0}, "prof_type": {role: 0 for role in org_roles[org_types[0]]}}
+    assert field_weight_errors(org_types, weights) == []
+    assert len(sample_user_fields(50, org_types, weights, rng=np.random.default_rng(0))) == 50
@@ -0,0 +1,136 @@
+import pytest
+
+import deploy_cache
+from deploy_cache import BloomFilter, KnownUsersCache, KnownUsersView
+
+API = "http://api"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_700_000_000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(deploy_cache.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def store(tmp_path, clock):
+    return KnownUsersCache(str(tmp_path / "cache.db"))
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = [f"{API}|user{k}@example.com" for k in range(1000)]
+    for key in keys:
+        bloom.add(key)
+
+    assert all(key in bloom for key in keys)
+    false_positives = sum(f"{API}|other{k}@example.com" in bloom for k in range(10000))
+    assert false_positives < 300  # ~1% expected at capacity
+
+
+def test_lookup_is_case_insensitive_and_per_api(store):
+    store.remember(API, "Ada@Example.com", in_db=True)
+
+    assert store.lookup(API, "ada@example.com", ttl_seconds=60) == {"in_db": True, "in_cognito": False}
+    assert store.lookup("http://other", "ada@example.com", ttl_seconds=60) is None
+    assert store.lookup(API, "bob@example.com", ttl_seconds=60) is None
+
+
+def test_entries_expire_after_ttl(store, clock):
+    store.remember(API, "ada@example.com", in_db=True, in_cognito=True)
+    store.remember(API, "bob@example.com", in_db=True)
+
+    clock.now += 60
+    assert store.lookup(API, "ada@example.com", ttl_seconds=60) is not None
+    assert set(store.lookup_many(API, ["ada@example.com", "BOB@example.com"], ttl_seconds=60)) == {
+        "ada@example.com", "bob@example.com"
+    }
+
+    clock.now += 1
+    assert store.lookup(API, "ada@example.com", ttl_seconds=60) is None
+    assert store.lookup_many(API, ["ada@example.com", "bob@example.com"], ttl_seconds=60) == {}
+    assert store.lookup(API, "ada@example.com", ttl_seconds=3600) is not None
+
+
+def test_remember_many_keeps_known_systems(store, clock):
+    store.remember_many([(API, "ada@example.com", True, False), (API, "bob@example.com", False, True)])
+    clock.now += 30
+    # A later run that only saw Cognito must not forget the DB entry
+    store.remember_many([(API, "ada@example.com", False, True), (API, "bob@example.com", False, False)])
+
+    entries = store.lookup_many(API, ["ada@example.com", "bob@example.com"], ttl_seconds=20)
+    assert entries == {
+        "ada@example.com": {"in_db": True, "in_cognito": True},
+        "bob@example.com": {"in_db": False, "in_cognito": True}
+    }
+    assert store.stats() == {"users": 2, "in_db": 1, "in_cognito": 2}
+
+
+def test_lookup_many_spans_query_chunks(store):
+    emails = [f"user{k}@example.com" for k in range(1200)]
+    store.remember_many([(API, email, True, False) for email in emails[::2]])
+
+    entries = store.lookup_many(API, emails, ttl_seconds=60)
+    assert sorted(entries) == sorted(emails[::2])
+
+
+def test_bloom_filter_is_rebuilt_from_disk(tmp_path, clock):
+    path = str(tmp_path / "cache.db")
+    KnownUsersCache(path).remember(API, "ada@example.com", in_db=True)
+
+    assert KnownUsersCache(path).lookup(API, "ada@example.com", ttl_seconds=60) == {"in_db": True, "in_cognito": False}
+
+
+def test_purge_and_clear(store, clock):
+    store.remember(API, "ada@example.com", in_db=True)
+    clock.now += 100
+    store.remember(API, "bob@example.com", in_db=True)
+
+    store.purge_expired(ttl_seconds=50)
+    assert store.stats()["users"] == 1
+    store.clear()
+    assert store.lookup(API, "bob@example.com", ttl_seconds=60) is None
+
+
+def test_view_bypass_skips_lookups_but_records(store):
+    store.remember(API, "ada@example.com", in_db=True)
+    view = KnownUsersView(store, ttl_seconds=60, bypass=True)
+
+    assert view.lookup(API, "ada@example.com") is None
+    assert view.preload(API, ["ada@example.com"]).entries == {}
+
+    view.remember(API, "bob@example.com", in_cognito=True)
+    assert store.lookup(API, "bob@example.com", ttl_seconds=60) == {"in_db": False, "in_cognito": True}
+
+
+def test_view_applies_its_own_ttl(store, clock):
+    store.remember(API, "ada@example.com", in_db=True)
+    clock.now += 120
+    short = KnownUsersView(store, ttl_seconds=60)
+    long = KnownUsersView(store, ttl_seconds=3600)
+
+    assert short.lookup(API, "ada@example.com") is None
+    assert long.lookup(API, "ada@example.com") == {"in_db": True, "in_cognito": False}
+
+
+def test_preloaded_batch_buffers_writes_until_flush(store):
+    store.remember(API, "ada@example.com", in_db=True)
+    batch = KnownUsersView(store, ttl_seconds=60).preload(API, ["ADA@example.com", "bob@example.com"])
+
+    assert batch.lookup(API, "Ada@Example.com") == {"in_db": True, "in_cognito": False}
+    assert batch.lookup("http://other", "ada@example.com") is None
+    batch.remember(API, "bob@example.com", in_db=True, in_cognito=True)
+    assert store.lookup(API, "bob@example.com", ttl_seconds=60) is None
+
+    batch.flush()
+    assert store.lookup(API, "bob@example.com", ttl_seconds=60) == {"in_db": True, "in_cognito": True}
+    assert batch.pending == []
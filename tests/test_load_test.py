@@ -0,0 +1,84 @@
+import pytest
+import requests
+
+from app import classify_request_error, percentile, run_load_test, summarize_load_test
+from stub_server import start_stub_server
+
+
+def test_percentile_uses_nearest_rank():
+    values = list(range(1, 11))
+
+    assert percentile(values, 50) == 5
+    assert percentile(values, 90) == 9
+    assert percentile(values, 99) == 10
+    assert percentile(values, 0) == 1
+    assert percentile([42.0], 99.9) == 42.0
+    assert percentile([], 50) == 0.0
+
+
+def test_summarize_load_test_tables():
+    samples = [
+        ("/onboard-user/", 0.010, 0.008, None),
+        ("/onboard-user/", 0.030, 0.009, None),
+        ("/onboard-user/", 0.500, 0.020, "Timeout"),
+        ("/cognito/onboard", 0.020, 0.010, None),
+        ("/cognito/onboard", 0.040, 0.011, "HTTP 503"),
+        ("/cognito/onboard", 0.060, 0.012, "HTTP 503"),
+    ]
+
+    results = summarize_load_test(samples, 20.0, dispatch_elapsed=0.2, elapsed=0.5, max_dispatch_lag=0.003)
+
+    assert (results["requests_sent"], results["requests_succeeded"]) == (6, 3)
+    assert results["achieved_send_rate"] == pytest.approx(30.0)
+    assert results["throughput"] == pytest.approx(6.0)
+    assert results["max_dispatch_lag_ms"] == pytest.approx(3.0)
+
+    rows = {row["Endpoint"]: row for row in results["endpoints"]}
+    assert list(rows) == ["/cognito/onboard", "/onboard-user/", "All"]
+    onboard = rows["/onboard-user/"]
+    assert (onboard["Requests"], onboard["Errors"]) == (3, 1)
+    assert onboard["Throughput (req/s)"] == pytest.approx(4.0)
+    assert onboard["p50 (ms)"] == pytest.approx(30.0)
+    assert onboard["Max (ms)"] == pytest.approx(500.0)
+    assert onboard["Service p50 (ms)"] == pytest.approx(9.0)  # Latency is corrected, service time is not
+    assert rows["All"]["Requests"] == 6
+    assert rows["All"]["p99 (ms)"] == pytest.approx(500.0)
+
+    assert results["errors"] == [
+        {"Endpoint": "/cognito/onboard", "Error": "HTTP 503", "Count": 2},
+        {"Endpoint": "/onboard-user/", "Error": "Timeout", "Count": 1}
+    ]
+
+
+def test_summarize_load_test_without_samples():
+    results = summarize_load_test([], 10.0, dispatch_elapsed=0.0, elapsed=0.0, max_dispatch_lag=0.0)
+
+    assert results["throughput"] == 0.0
+    assert results["endpoints"] == [{
+        "Endpoint": "All", "Requests": 0, "Errors": 0, "Throughput (req/s)": 0.0, "p50 (ms)": 0.0, "p90 (ms)": 0.0,
+        "p99 (ms)": 0.0, "p99.9 (ms)": 0.0, "Max (ms)": 0.0, "Service p50 (ms)": 0.0, "Service p99 (ms)": 0.0
+    }]
+
+
+def test_classify_request_error():
+    response = requests.Response()
+    response.status_code = 503
+
+    assert classify_request_error(requests.exceptions.HTTPError(response=response)) == "HTTP 503"
+    assert classify_request_error(requests.exceptions.ReadTimeout()) == "Timeout"
+    assert classify_request_error(requests.exceptions.ConnectionError()) == "Connection error"
+    assert classify_request_error(ValueError("bad json")) == "ValueError"
+
+
+def test_run_load_test_sends_two_requests_per_arrival():
+    server = start_stub_server()
+    users = [{"email": f"user{k}@example.com", "first_name": "User", "last_name": str(k)} for k in range(5)]
+    try:
+        results = run_load_test(f"http://127.0.0.1:{server.server_port}", users, target_rate=50, duration_seconds=0.2)
+    finally:
+        server.shutdown()
+
+    assert results["target_rate"] == 100
+    assert (results["requests_sent"], results["requests_succeeded"]) == (20, 20)
+    assert server.state.request_counts == {"/onboard-user/": 10, "/cognito/onboard": 10}
+    assert results["errors"] == []
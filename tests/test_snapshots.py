@@ -0,0 +1,137 @@
+import pyarrow as pa
+import pytest
+
+from snapshots import (
+    SnapshotEmployees, employees_to_table, list_snapshots, load_snapshot, read_snapshot_info, save_snapshot
+)
+
+
+def make_employees(count):
+    return [
+        {
+            "Name": f"User {k}",
+            "Email": f"user{k}@example.com",
+            "Role Type": ("staff", "instructor", "facility_admin")[k % 3],
+            "Org Type": "SLF" if k % 2 else "ALF/SHE",
+            "DB Status": "Generated",
+            "Cognito Status": "Pending",
+            "Temporary Password": f"secret-{k}",
+            "api_data": {"email": f"user{k}@example.com", "org_type": "SLF" if k % 2 else "ALF/SHE"}
+        }
+        for k in range(count)
+    ]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = save_snapshot(make_employees(10), "Team A", "Sunrise", ["ALF/SHE", "SLF"], directory=str(tmp_path))
+    return load_snapshot(path)
+
+
+def test_save_and_load_round_trip(snapshot):
+    employees, info = snapshot
+    expected = make_employees(10)
+    for record in expected:
+        record["Temporary Password"] = None  # Never persisted
+
+    assert len(employees) == 10
+    assert list(employees) == expected
+    assert info["name"] == "Team_A"
+    assert info["rows"] == 10
+    assert info["org_name"] == "Sunrise"
+    assert info["org_types"] == ["ALF/SHE", "SLF"]
+
+
+def test_info_without_org_types(tmp_path):
+    table = employees_to_table(make_employees(3), "Sunrise")
+    metadata = {key: value for key, value in table.schema.metadata.items() if key != b"org_types"}
+    path = tmp_path / "old.arrow"
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema.with_metadata(metadata)) as writer:
+            writer.write_table(table)
+    assert read_snapshot_info(str(path))["org_types"] == []
+
+
+def test_list_snapshots(tmp_path):
+    save_snapshot(make_employees(2), "one", directory=str(tmp_path))
+    save_snapshot(make_employees(3), "two/../bad name", directory=str(tmp_path))
+    infos = list_snapshots(str(tmp_path))
+    assert sorted(info["rows"] for info in infos) == [2, 3]
+    assert all(info["path"].startswith(str(tmp_path)) for info in infos)
+    assert list_snapshots(str(tmp_path / "missing")) == []
+
+
+def test_indexing_and_slicing(snapshot):
+    employees, _ = snapshot
+    assert employees[0]["Name"] == "User 0"
+    assert employees[-1]["Name"] == "User 9"
+    assert [row["Name"] for row in employees[2:5]] == ["User 2", "User 3", "User 4"]
+    with pytest.raises(IndexError):
+        employees[10]
+
+
+def test_row_updates_stick(snapshot):
+    employees, _ = snapshot
+    employees[1]["DB Status"] = "Deployed ✅"
+    assert employees[1]["DB Status"] == "Deployed ✅"
+    assert employees.where("Org Type", "SLF")[0]["DB Status"] == "Deployed ✅"
+
+
+def test_value_counts_include_updated_rows(snapshot):
+    employees, _ = snapshot
+    assert employees.value_counts("Role Type") == {"staff": 4, "instructor": 3, "facility_admin": 3}
+
+    employees[0]["DB Status"] = "Deployed ✅"
+    employees[3]["DB Status"] = "Failed ❌"
+    assert employees.value_counts("DB Status") == {"Generated": 8, "Deployed ✅": 1, "Failed ❌": 1}
+    assert employees.value_counts("Cognito Status", "Pending") == {"Pending": 10}
+
+
+def test_where_filters_and_chains(snapshot):
+    employees, _ = snapshot
+    slf = employees.where("Org Type", "SLF")
+    assert [row["Name"] for row in slf] == ["User 1", "User 3", "User 5", "User 7", "User 9"]
+
+    staff_slf = slf.where("Role Type", "staff")
+    assert [row["Name"] for row in staff_slf] == ["User 3", "User 9"]
+    assert staff_slf.value_counts("Org Type") == {"SLF": 2}
+
+    employees[5]["Org Type"] = "ALF/SHE"
+    assert len(employees.where("Org Type", "SLF")) == 4
+
+
+def test_unmodified_table_is_reused(snapshot, tmp_path):
+    employees, _ = snapshot
+    slf = employees.where("Org Type", "SLF")
+    assert slf.unmodified_table().num_rows == 5
+
+    path = save_snapshot(slf, "slf", "Sunrise", ["SLF"], directory=str(tmp_path))
+    reloaded, info = load_snapshot(path)
+    assert info["org_types"] == ["SLF"]
+    assert [row["Name"] for row in reloaded] == [row["Name"] for row in slf]
+
+    slf[0]["DB Status"] = "Deployed ✅"
+    assert slf.unmodified_table() is None
+
+
+def test_rejects_non_snapshot_files(tmp_path):
+    table = pa.table({"x": [1, 2]})
+    path = tmp_path / "other.arrow"
+    with pa.OSFile(str(path), "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    with pytest.raises(ValueError):
+        load_snapshot(str(path))
+
+
+def test_empty_roster_cannot_be_saved(tmp_path):
+    with pytest.raises(ValueError):
+        save_snapshot([], "empty", directory=str(tmp_path))
+
+
+def test_iteration_spans_chunks(monkeypatch, snapshot):
+    import snapshots
+    monkeypatch.setattr(snapshots, "ITER_CHUNK_SIZE", 3)
+    employees, _ = snapshot
+    assert [row["Name"] for row in employees] == [f"User {k}" for k in range(10)]
+    assert isinstance(employees, SnapshotEmployees)
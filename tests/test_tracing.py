@@ -0,0 +1,105 @@
+import json
+
+import pytest
+
+from circuit_breaker import create_circuit_breakers
+from deploy_backends import deploy_org_with_backend
+from stub_server import start_stub_server
+from tracing import NULL_TRACER, Tracer
+
+
+@pytest.fixture
+def stub():
+    server = start_stub_server(latency_ms=2)
+    yield server
+    server.shutdown()
+
+
+def make_org(org_name, count):
+    employees = []
+    for k in range(count):
+        email = f"{org_name.lower()}{k}@example.com"
+        api_data = {
+            "first_name": "User",
+            "last_name": str(k),
+            "email": email,
+            "org_name": org_name,
+            "org_types": ["SLF"],
+            "role_type": "staff"
+        }
+        employees.append({"Email": email, "DB Status": "Generated", "Cognito Status": "Pending", "api_data": api_data})
+    return {"org_name": org_name, "org_types": ["SLF"], "employees": employees}
+
+
+def misnested(events):
+    """Complete events that start inside another event of their thread but end after it"""
+    by_thread = {}
+    for event in events:
+        if event["ph"] == "X":
+            by_thread.setdefault(event["tid"], []).append(event)
+    bad = []
+    for thread_events in by_thread.values():
+        stack = []
+        for event in sorted(thread_events, key=lambda event: (event["ts"], -event["dur"])):
+            while stack and stack[-1]["ts"] + stack[-1]["dur"] <= event["ts"]:
+                stack.pop()
+            if stack and event["ts"] + event["dur"] > stack[-1]["ts"] + stack[-1]["dur"] + 1e-3:
+                bad.append(event)
+            stack.append(event)
+    return bad
+
+
+def test_async_span_exports_begin_end_pairs():
+    tracer = Tracer()
+    with tracer.async_span("db_onboard", "a@example.com", stage="db"):
+        pass
+    with tracer.span("org_creation"):
+        pass
+
+    events = json.loads(tracer.to_chrome_trace())["traceEvents"]
+    pair = [event for event in events if event["name"] == "db_onboard"]
+    assert [event["ph"] for event in pair] == ["b", "e"]
+    assert {event["id"] for event in pair} == {"a@example.com"}
+    assert pair[0]["args"] == {"stage": "db"} and "dur" not in pair[0]
+    assert [row["Span"] for row in tracer.summary()].count("db_onboard") == 1
+
+
+def test_null_tracer_accepts_async_spans():
+    with NULL_TRACER.async_span("db_onboard", "a@example.com"):
+        pass
+
+
+@pytest.mark.parametrize("backend", ["threaded", "async"])
+def test_onboarding_spans_time_each_request(stub, backend):
+    tracer = Tracer()
+    org_config = make_org(f"Trace{backend}", 12)
+
+    deploy_org_with_backend(org_config, f"http://127.0.0.1:{stub.server_port}", backend, 4, tracer=tracer)
+
+    events = json.loads(tracer.to_chrome_trace())["traceEvents"]
+    assert misnested(events) == []
+    counts = {row["Span"]: row["Count"] for row in tracer.summary()}
+    assert (counts["onboard_user"], counts["db_onboard"], counts["cognito_onboard"]) == (12, 12, 12)
+    if backend == "async":
+        requests = [event for event in events if event["name"].endswith("_onboard") and event["ph"] == "b"]
+        assert {event["id"] for event in requests} == {employee["Email"] for employee in org_config["employees"]}
+
+
+def test_bulk_traces_one_span_per_request(stub):
+    tracer = Tracer()
+    breakers = create_circuit_breakers(min_calls=1, window=1, cooldown_seconds=0.5)
+    breakers["db"].record(False, 0.0, breakers["db"].allow_request())  # The first batch waits for a probe
+
+    deploy_org_with_backend(
+        make_org("TraceBulk", 12), f"http://127.0.0.1:{stub.server_port}", "bulk", 5, tracer=tracer,
+        breakers=breakers, max_queue_wait=5
+    )
+
+    events = json.loads(tracer.to_chrome_trace())["traceEvents"]
+    assert misnested(events) == []
+    bulk_requests = [event for event in events if event["name"] == "bulk_request"]
+    assert [event["args"] for event in bulk_requests] == [
+        {"stage": stage, "users": users} for stage in ("db", "cognito") for users in (5, 5, 2)
+    ]
+    assert max(event["dur"] for event in bulk_requests) < 250_000  # Breaker wait is not request time
+    assert not any(event["name"] in ("onboard_user", "db_onboard", "cognito_onboard") for event in events)
@@ -0,0 +1,109 @@
+import json
+
+import pytest
+
+from wire_format import (
+    COMPACT_BATCH_FORMAT, SUPPORTED_ENCODINGS, RequestEncoder, compress, decode_compact_batch, decompress,
+    dumps_compact, encode_compact_batch
+)
+
+
+def make_records(count):
+    return [
+        {
+            "first_name": f"User{k}",
+            "email": f"user{k}@example.com",
+            "org_name": "Sunrise Senior Living",
+            "org_type": "ALF/SHE" if k % 3 else "SLF",
+            "is_facility_admin": k == 0,
+            "years": k % 5 or None
+        }
+        for k in range(count)
+    ]
+
+
+def test_compact_batch_round_trip():
+    records = make_records(20)
+    payload = encode_compact_batch(records)
+
+    assert payload["format"] == COMPACT_BATCH_FORMAT
+    assert payload["shared"] == {"org_name": "Sunrise Senior Living"}
+    assert "org_name" not in payload["fields"]
+    assert payload["dictionaries"]["org_type"] == ["SLF", "ALF/SHE"]
+    assert "email" not in payload["dictionaries"]
+    assert decode_compact_batch(json.loads(dumps_compact(payload))) == records
+
+
+def test_compact_batch_single_and_empty():
+    records = make_records(1)
+    payload = encode_compact_batch(records)
+    assert payload["shared"] == {}
+    assert decode_compact_batch(payload) == records
+    assert decode_compact_batch(encode_compact_batch([])) == []
+
+
+def test_compact_batch_is_smaller_than_plain_json():
+    records = make_records(200)
+    assert len(dumps_compact(encode_compact_batch(records))) < len(json.dumps(records))
+
+
+def test_decode_rejects_unknown_format():
+    with pytest.raises(ValueError):
+        decode_compact_batch({"format": "compact-v0", "fields": [], "rows": []})
+
+
+@pytest.mark.parametrize("encoding", SUPPORTED_ENCODINGS)
+def test_compress_round_trip(encoding):
+    body = dumps_compact(make_records(50))
+    compressed = compress(body, encoding)
+    assert len(compressed) < len(body)
+    assert decompress(compressed, encoding) == body
+
+
+def test_unsupported_encoding():
+    with pytest.raises(ValueError):
+        compress(b"{}", "br")
+    with pytest.raises(ValueError):
+        decompress(b"{}", "br")
+    assert decompress(b"{}", "identity") == b"{}"
+
+
+def test_encoder_compresses_after_host_accepts_coding():
+    encoder = RequestEncoder("gzip", min_size=16)
+    url = "http://api.test/onboard-user/"
+    data = make_records(5)
+
+    body, headers, raw_size = encoder.encode(url, data)
+    assert "Content-Encoding" not in headers
+    assert body == dumps_compact(data)
+    assert raw_size == len(json.dumps(data).encode("utf-8"))
+
+    assert not encoder.observe(url, 200, {"Accept-Encoding": "gzip, deflate"}, headers)
+    body, headers, _ = encoder.encode(url, data)
+    assert headers["Content-Encoding"] == "gzip"
+    assert decompress(body, "gzip") == dumps_compact(data)
+
+    # Other hosts are negotiated separately
+    _, other_headers, _ = encoder.encode("http://other.test/onboard-user/", data)
+    assert "Content-Encoding" not in other_headers
+
+
+def test_encoder_stops_compressing_after_415():
+    encoder = RequestEncoder("gzip", min_size=16)
+    url = "http://api.test/onboard-user/"
+    data = make_records(5)
+    encoder.observe(url, 200, {"Accept-Encoding": "gzip"}, {})
+    _, headers, _ = encoder.encode(url, data)
+
+    assert encoder.observe(url, 415, {"Accept-Encoding": "gzip"}, headers)
+    _, headers, _ = encoder.encode(url, data)
+    assert "Content-Encoding" not in headers
+    assert not encoder.observe(url, 415, {}, headers)
+
+
+def test_encoder_skips_small_bodies():
+    encoder = RequestEncoder("gzip", min_size=256)
+    url = "http://api.test/onboard-user/"
+    encoder.observe(url, 200, {"Accept-Encoding": "gzip"}, {})
+    _, headers, _ = encoder.encode(url, {"email": "a@example.com"})
+    assert "Content-Encoding" not in headers
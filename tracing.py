@@ -0,0 +1,118 @@
+"""Pipeline tracing exportable to the Chrome trace-event format"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+
+class Tracer:
+    """Collects timed spans and exports them as Chrome trace-event JSON
+
+    The exported file can be opened in chrome://tracing or ui.perfetto.dev.
+    Spans may be recorded from any thread.
+    """
+
+    def __init__(self):
+        self.events = []
+        self._origin = time.perf_counter()
+        self._pid = os.getpid()
+        self._thread_names = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, category="deploy", **args):
+        """Record the duration of the enclosed block as a complete ("X") event"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": self._pid,
+                "tid": thread.ident,
+                "args": args
+            }
+            with self._lock:
+                self.events.append(event)
+                self._thread_names[thread.ident] = thread.name
+
+    @contextmanager
+    def async_span(self, name, span_id, category="deploy", **args):
+        """Record the enclosed block as an async ("b"/"e") event pair grouped under span_id
+
+        For blocks that await: tasks interleaved on one event loop thread
+        would misnest as complete events, so each task's spans go on their
+        own track keyed by span_id (e.g. the user's email) instead.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            event = {
+                "name": name,
+                "cat": category,
+                "ph": "b",
+                "ts": (start - self._origin) * 1e6,
+                "dur": (end - start) * 1e6,
+                "pid": self._pid,
+                "tid": threading.get_ident(),
+                "id": str(span_id),
+                "args": args
+            }
+            with self._lock:
+                self.events.append(event)
+
+    def to_chrome_trace(self):
+        """Serialize recorded spans in Chrome trace-event format"""
+        with self._lock:
+            metadata = [
+                {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": thread_name}}
+                for tid, thread_name in self._thread_names.items()
+            ]
+            events = []
+            for event in self.events:
+                if event["ph"] == "b":
+                    begin = {key: value for key, value in event.items() if key != "dur"}
+                    end = {**begin, "ph": "e", "ts": event["ts"] + event["dur"], "args": {}}
+                    events.extend((begin, end))
+                else:
+                    events.append(event)
+        events.sort(key=lambda event: event["ts"])
+        return json.dumps({"traceEvents": metadata + events, "displayTimeUnit": "ms"})
+
+    def summary(self):
+        """Aggregate span durations by name, slowest total first"""
+        totals = {}
+        with self._lock:
+            for event in self.events:
+                entry = totals.setdefault(event["name"], {"Span": event["name"], "Count": 0, "Total (ms)": 0.0, "Max (ms)": 0.0})
+                duration_ms = event["dur"] / 1000
+                entry["Count"] += 1
+                entry["Total (ms)"] += duration_ms
+                entry["Max (ms)"] = max(entry["Max (ms)"], duration_ms)
+        rows = sorted(totals.values(), key=lambda entry: entry["Total (ms)"], reverse=True)
+        for entry in rows:
+            entry["Mean (ms)"] = entry["Total (ms)"] / entry["Count"]
+        return rows
+
+
+class NullTracer:
+    """Tracer stand-in that records nothing"""
+
+    def span(self, name, category="deploy", **args):
+        return nullcontext()
+
+    def async_span(self, name, span_id, category="deploy", **args):
+        return nullcontext()
+
+
+NULL_TRACER = NullTracer()
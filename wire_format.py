@@ -0,0 +1,174 @@
+"""Request body encodings shared by the app and the local stub server
+
+Covers compact JSON, request compression (gzip and zstd), the per-host
+RequestEncoder that decides how the app encodes each request, and the
+compact batch format used by the bulk onboarding endpoints. A compact batch
+stores fields that are identical for every record once, and replaces
+repeated strings with indices into a per-field dictionary:
+
+    {
+        "format": "compact-v1",
+        "shared": {"org_name": "Sunrise Senior Living", ...},
+        "fields": ["first_name", "email", "org_type", ...],
+        "dictionaries": {"org_type": ["ALF/SHE", "SLF"], ...},
+        "rows": [["Jane", "jane.doe@...", 1, ...], ...]
+    }
+"""
+
+import gzip
+import json
+import threading
+from urllib.parse import urlsplit
+
+import zstandard
+
+COMPACT_BATCH_FORMAT = "compact-v1"
+
+# Content codings the app and stub server can produce/accept, most preferred first
+SUPPORTED_ENCODINGS = ["zstd", "gzip"]
+
+
+def dumps_compact(data):
+    """Serialize to JSON bytes without optional whitespace"""
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def compress(body, encoding):
+    """Compress a request body with the given content coding"""
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6)
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def decompress(body, encoding):
+    """Decode a request body with the given content coding"""
+    if not encoding or encoding == "identity":
+        return body
+    if encoding == "gzip":
+        return gzip.decompress(body)
+    if encoding == "zstd":
+        return zstandard.ZstdDecompressor().decompressobj().decompress(body)
+    raise ValueError(f"Unsupported content encoding: {encoding}")
+
+
+def encode_compact_batch(records):
+    """Encode a list of same-shaped dicts as a compact batch"""
+    if not records:
+        return {"format": COMPACT_BATCH_FORMAT, "shared": {}, "fields": [], "dictionaries": {}, "rows": []}
+
+    fields = list(records[0])
+    shared = {}
+    if len(records) > 1:
+        shared = {
+            field: records[0][field] for field in fields
+            if all(record.get(field) == records[0][field] for record in records)
+        }
+    row_fields = [field for field in fields if field not in shared]
+
+    # Dictionary-encode string fields where values repeat a lot
+    dictionaries = {}
+    for field in row_fields:
+        values = [record.get(field) for record in records]
+        if all(isinstance(value, str) for value in values):
+            unique_values = list(dict.fromkeys(values))
+            if len(unique_values) * 2 <= len(values):
+                dictionaries[field] = unique_values
+    indexes = {field: {value: k for k, value in enumerate(values)} for field, values in dictionaries.items()}
+
+    rows = [
+        [indexes[field][record.get(field)] if field in indexes else record.get(field) for field in row_fields]
+        for record in records
+    ]
+    return {
+        "format": COMPACT_BATCH_FORMAT,
+        "shared": shared,
+        "fields": row_fields,
+        "dictionaries": dictionaries,
+        "rows": rows
+    }
+
+
+def decode_compact_batch(payload):
+    """Expand a compact batch back into a list of dicts"""
+    if payload.get("format") != COMPACT_BATCH_FORMAT:
+        raise ValueError(f"Unsupported batch format: {payload.get('format')}")
+    fields = payload["fields"]
+    dictionaries = payload.get("dictionaries", {})
+    records = []
+    for row in payload["rows"]:
+        record = dict(payload.get("shared", {}))
+        for field, value in zip(fields, row):
+            record[field] = dictionaries[field][value] if field in dictionaries else value
+        records.append(record)
+    return records
+
+
+class RequestEncoder:
+    """Request body encoding negotiated per API host
+
+    Bodies are sent as compact JSON. Once a response from a host lists the
+    configured coding in its Accept-Encoding header (RFC 7694), bodies of at
+    least min_size bytes are compressed with it; a 415 reply turns the coding
+    off for that host. Also remembers hosts without the bulk endpoints.
+    Safe to share between threads.
+    """
+
+    def __init__(self, compression="gzip", min_size=256):
+        if compression and compression not in SUPPORTED_ENCODINGS:
+            raise ValueError(f"Unsupported request compression: {compression}")
+        self.compression = compression
+        self.min_size = min_size
+        self._accepted_codings = {}
+        self._rejected_codings = {}
+        self._hosts_without_bulk = set()
+        self._lock = threading.Lock()
+
+    def config(self):
+        """Constructor arguments, for rebuilding the encoder in worker processes"""
+        return {"compression": self.compression, "min_size": self.min_size}
+
+    def encode(self, url, data):
+        """Return (body, headers, raw_size); raw_size is the size of a plain json= body"""
+        host = urlsplit(url).netloc
+        raw_size = len(json.dumps(data).encode("utf-8"))
+        body = dumps_compact(data)
+        headers = {"Content-Type": "application/json"}
+        with self._lock:
+            accepted = (
+                self.compression in self._accepted_codings.get(host, ())
+                and self.compression not in self._rejected_codings.get(host, ())
+            )
+        if accepted and len(body) >= self.min_size:
+            body = compress(body, self.compression)
+            headers["Content-Encoding"] = self.compression
+        return body, headers, raw_size
+
+    def observe(self, url, status_code, response_headers, request_headers):
+        """Learn which codings a host accepts from one of its responses
+
+        Returns True if the server rejected the request's coding and the
+        request should be resent uncompressed.
+        """
+        host = urlsplit(url).netloc
+        accept_encoding = response_headers.get("Accept-Encoding")
+        sent_coding = request_headers.get("Content-Encoding")
+        with self._lock:
+            if accept_encoding is not None:
+                self._accepted_codings[host] = {
+                    coding.split(";")[0].strip().lower() for coding in accept_encoding.split(",")
+                }
+            if status_code == 415 and sent_coding:
+                self._rejected_codings.setdefault(host, set()).add(sent_coding)
+                return True
+        return False
+
+    def bulk_supported(self, url):
+        """False once the host answered a bulk request with 404"""
+        with self._lock:
+            return urlsplit(url).netloc not in self._hosts_without_bulk
+
+    def mark_bulk_unsupported(self, url):
+        with self._lock:
+            self._hosts_without_bulk.add(urlsplit(url).netloc)